@@ -1,12 +1,24 @@
 import asyncio
+import atexit
 import csv
+import functools
+import html
+import io
 import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import List, Dict, Any
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, FrozenSet, Iterable, Iterator, Optional, TextIO, Tuple, Union
+from itertools import islice
+import queue
+import random
 import re
+import signal
+import threading
+import time
 import concurrent.futures
 
 from telethon import TelegramClient, errors, functions
@@ -19,19 +31,36 @@ from telegram import (
     InputFile,
 )
 from telegram.ext import (
+    AIORateLimiter,
     ApplicationBuilder,
+    ApplicationHandlerStop,
     ContextTypes,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     ConversationHandler,
+    TypeHandler,
     filters,
 )
 from telegram.constants import ParseMode
+from telegram.error import RetryAfter, TimedOut
 
-from apify_client import ApifyClient
+from aiolimiter import AsyncLimiter
+from apify_client import ApifyClientAsync
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library json module
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    # Not available on Windows; use the default asyncio event loop
+    uvloop = None
+
 # ============================
 # Configuration and Setup
 # ============================
@@ -50,16 +79,23 @@ WEBHOOK_URL = os.getenv("WEBHOOK_URL", f"https://yourdomain.com/{BOT_TOKEN}")
 # Flag to determine whether to use webhook or polling
 USE_WEBHOOK = os.getenv("USE_WEBHOOK", "False").lower() == "true"
 
-# List of Admin Telegram User IDs (Comma-Separated String)
+# Maximum number of simultaneous webhook connections Telegram opens to the bot (1-100; Telegram's default is 40)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 100))
+
+# Optional secret Telegram sends with every webhook request, so forged updates are rejected
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN") or None
+
+# Admin Telegram User IDs (Comma-Separated String), frozen into a set once at import time for O(1) admin checks
 admins_env = os.getenv("ADMINS", "")
+ADMINS: FrozenSet[int]
 if admins_env:
     try:
-        ADMINS = [int(uid.strip()) for uid in admins_env.split(",") if uid.strip().isdigit()]
+        ADMINS = frozenset(int(uid.strip()) for uid in admins_env.split(",") if uid.strip().isdigit())
     except ValueError:
-        ADMINS = []
+        ADMINS = frozenset()
         logging.getLogger(__name__).error("ADMINS environment variable contains non-integer values. Using an empty admin list.")
 else:
-    ADMINS = []
+    ADMINS = frozenset()
     logging.getLogger(__name__).warning("ADMINS environment variable is not set. Using an empty admin list.")
 
 # ==========================
@@ -84,55 +120,206 @@ handler = RotatingFileHandler(
 )
 formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 handler.setFormatter(formatter)
-logger.addHandler(handler)
+
+# Records are handed to a queue and written to the file by a background thread,
+# so log calls never block the event loop on disk I/O
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, handler)
+log_listener.start()
+# Flush queued records on exit
+atexit.register(log_listener.stop)
 
 # ==========================
 # End of Logging Configuration
 # ==========================
 
-# File to store blocked users and user sessions
+# File to store blocked users and bot settings
 CONFIG_FILE = BASE_DIR / 'config.json'
 
+# Directory holding one JSON file per user session, so that session updates
+# never rewrite config.json and blocking a user never rewrites session results
+SESSIONS_DIR = BASE_DIR / "sessions"
+SESSIONS_DIR.mkdir(exist_ok=True)
+
+# Sessions not updated for this many seconds are discarded when next read (override with SESSION_TTL)
+SESSION_TTL = int(os.getenv("SESSION_TTL", 7 * 24 * 3600))
+
 # Initialize or load configurations
 default_config = {
     "blocked_users": [],
-    "user_sessions": {},
     "telegram_api_id": None,
     "telegram_api_hash": None,
     "telegram_string_session": None,
     "target_channel_username": None,
-    "apify_api_token": None
+    "apify_api_token": None,
+    "invite_rate": None
 }
 
-if CONFIG_FILE.exists():
-    with CONFIG_FILE.open('r', encoding='utf-8') as f:
-        try:
-            config = json.load(f)
-            # Ensure all keys are present
-            for key, value in default_config.items():
-                if key not in config:
-                    config[key] = value
-        except json.JSONDecodeError:
-            logger.error("config.json is corrupted. Resetting configurations.")
-            config = default_config.copy()
-            with CONFIG_FILE.open('w', encoding='utf-8') as fw:
-                json.dump(config, fw, indent=4, ensure_ascii=False)
-else:
+def dump_json(data: Any) -> bytes:
+    """
+    Serialize data to indented UTF-8 JSON, using orjson when it is available.
+
+    Args:
+        data (Any): JSON-serializable data.
+
+    Returns:
+        bytes: Encoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+def load_json(raw: bytes) -> Any:
+    """
+    Parse a JSON document, using orjson when it is available.
+
+    Args:
+        raw (bytes): Encoded JSON document.
+
+    Returns:
+        Any: Parsed data.
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Serializes config.json and session file writes coming from the event loop and from worker threads
+_file_write_lock = threading.Lock()
+
+def _write_file_atomic(path: Path, data: bytes):
+    """
+    Write data to a file through a temporary file that is atomically renamed over it.
+
+    The temporary file is flushed to disk before the rename, so after a crash
+    the file holds either the old or the new contents, never a partial write.
+
+    Args:
+        path (Path): Destination file.
+        data (bytes): File contents.
+    """
+    with _file_write_lock:
+        temp_file = path.with_name(path.name + ".tmp")
+        with open(temp_file, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, path)
+
+def _session_file(user_id: int) -> Path:
+    """
+    Return the path of the session file of a user.
+
+    Args:
+        user_id (int): Telegram user ID.
+
+    Returns:
+        Path: Session file path.
+    """
+    return SESSIONS_DIR / f"{int(user_id)}.json"
+
+try:
+    loaded_config = load_json(CONFIG_FILE.read_bytes())
+except FileNotFoundError:
+    loaded_config = None
+except json.JSONDecodeError:
+    # Atomic writes never leave a torn file behind, so this is a damaged or hand-edited file;
+    # keep it for manual recovery instead of overwriting it
+    corrupt_file = CONFIG_FILE.with_name(CONFIG_FILE.name + ".corrupt")
+    os.replace(CONFIG_FILE, corrupt_file)
+    logger.error("config.json is corrupted. Moved it to %s and reset the configuration.", corrupt_file)
+    loaded_config = None
+
+if loaded_config is None:
     config = default_config.copy()
-    with CONFIG_FILE.open('w', encoding='utf-8') as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
+    _write_file_atomic(CONFIG_FILE, dump_json(config))
+else:
+    # Move sessions stored by older versions into their own files
+    legacy_sessions = loaded_config.pop("user_sessions", None) or {}
+    for legacy_user_id, legacy_session in legacy_sessions.items():
+        _write_file_atomic(_session_file(legacy_user_id), dump_json(legacy_session))
+    # Ensure all keys are present, and only rewrite the file if it changed
+    config = {**default_config, **loaded_config}
+    if legacy_sessions or len(config) != len(loaded_config):
+        _write_file_atomic(CONFIG_FILE, dump_json(config))
+
+# Blocked user IDs, kept as a set for O(1) membership checks; written back to
+# config["blocked_users"] as a sorted list whenever the configuration is saved
+blocked_users_set = set(config["blocked_users"])
+
+# Write-through cache of the sessions read or written so far, keyed by user ID,
+# each with the time it was last updated so that SESSION_TTL applies to it too
+_session_cache: Dict[int, Tuple[float, "Session"]] = {}
+
+# Per-user locks that keep session file writes in the order they were made
+_session_write_locks: Dict[int, asyncio.Lock] = {}
 
 # Helper functions to manage configurations
-def save_config():
+def _serialize_config() -> bytes:
     """
-    Save the current configuration to config.json.
+    Serialize the current configuration, including the blocked users set.
+
+    Returns:
+        bytes: Encoded configuration.
+    """
+    config["blocked_users"] = sorted(blocked_users_set)
+    return dump_json(config)
+
+def _write_config(data: bytes):
+    """
+    Write serialized configuration to config.json.
+
+    Args:
+        data (bytes): Serialized configuration.
     """
     try:
-        with CONFIG_FILE.open('w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
+        _write_file_atomic(CONFIG_FILE, data)
         logger.info("Configuration saved successfully.")
     except Exception as e:
-        logger.error(f"Failed to save config.json: {e}")
+        logger.error("Failed to save config.json: %s", e)
+
+# Seconds a config.json write waits so that changes made in quick succession share one write
+CONFIG_WRITE_DELAY = 0.2
+
+# Scheduled write that has not serialized the configuration yet, and the most recent write
+_pending_config_write: Optional[asyncio.Task] = None
+_last_config_write: Optional[asyncio.Task] = None
+
+async def _write_config_later(previous: Optional[asyncio.Task]):
+    """
+    Wait CONFIG_WRITE_DELAY, then write the configuration from the default executor.
+
+    Args:
+        previous (asyncio.Task): Earlier write, which has to finish first so writes land in order.
+    """
+    global _pending_config_write
+    await asyncio.sleep(CONFIG_WRITE_DELAY)
+    if previous is not None:
+        await previous
+    # Changes made from here on need a new write
+    _pending_config_write = None
+    data = _serialize_config()
+    await asyncio.get_running_loop().run_in_executor(None, _write_config, data)
+
+async def save_config_async():
+    """
+    Save the current configuration without blocking the event loop.
+
+    Calls made within CONFIG_WRITE_DELAY of each other are coalesced into one
+    write. The configuration is serialized on the event loop, so the snapshot
+    is consistent, and the file is written from the default executor. Returns
+    once a write that includes the caller's changes has finished.
+    """
+    global _pending_config_write, _last_config_write
+    write = _pending_config_write
+    if write is None:
+        write = asyncio.ensure_future(_write_config_later(_last_config_write))
+        _pending_config_write = _last_config_write = write
+    # A cancelled caller must not cancel the write shared with other callers
+    await asyncio.shield(write)
 
 def is_admin(user_id: int) -> bool:
     """
@@ -146,30 +333,183 @@ def is_admin(user_id: int) -> bool:
     """
     return user_id in ADMINS
 
-def get_session(user_id: int) -> Dict[str, Any]:
+@dataclass
+class Session:
     """
-    Retrieve session data for a user.
+    Checker results of a user, with the views of them that the handlers use.
+    """
+
+    __slots__ = ("results", "registered", "registered_ids", "registered_count")
+
+    # All checker results
+    results: List[Dict[str, Any]]
+    # Registered results that have a user ID, and those user IDs
+    registered: List[Dict[str, Any]]
+    registered_ids: List[Any]
+    # Number of registered phone numbers, with or without a user ID
+    registered_count: int
+
+    @classmethod
+    def from_results(cls, results: List[Dict[str, Any]]) -> "Session":
+        """
+        Build a session from checker results, deriving the views in a single pass.
+
+        Args:
+            results (list): Results from the Telegram checker.
+
+        Returns:
+            Session: New session.
+        """
+        registered = []
+        registered_count = 0
+        for result in results:
+            if result.get("isRegistered"):
+                registered_count += 1
+                if result.get("userId"):
+                    registered.append(result)
+        return cls(results, registered, [result["userId"] for result in registered], registered_count)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        """
+        Build a session from its serialized form.
+
+        Args:
+            data (dict): Session as stored in a session file.
+
+        Returns:
+            Session: Loaded session.
+        """
+        if "registered" not in data:
+            # Saved before the derived views were stored
+            return cls.from_results(data.get("results", []))
+        return cls(*(data[name] for name in cls.__slots__))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the serializable form of the session.
+
+        Returns:
+            dict: Session fields by name.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+async def get_session_async(user_id: int) -> Session:
+    """
+    Retrieve session data for a user without blocking the event loop.
+
+    Sessions are served from the in-memory cache until they are older than
+    SESSION_TTL; on a miss the user's session file is read from the default executor.
 
     Args:
         user_id (int): Telegram user ID.
 
     Returns:
-        dict: Session data.
+        Session: Session data (empty if the user has none).
     """
-    return config.get("user_sessions", {}).get(str(user_id), {})
+    cached = _session_cache.get(user_id)
+    if cached is not None:
+        if time.time() - cached[0] <= SESSION_TTL:
+            return cached[1]
+        del _session_cache[user_id]
+    loaded = await asyncio.get_running_loop().run_in_executor(None, _load_session, user_id)
+    # Keep a session stored by set_session_async() while the file was being read
+    return _session_cache.setdefault(user_id, loaded)[1]
+
+def _load_session(user_id: int) -> Tuple[float, Session]:
+    """
+    Read a user's session file, deleting it if it is older than SESSION_TTL.
 
-def set_session(user_id: int, session_data: Dict[str, Any]):
+    Args:
+        user_id (int): Telegram user ID.
+
+    Returns:
+        tuple: Time the session was last updated, and the session data (empty if the user has none).
+    """
+    session_file = _session_file(user_id)
+    try:
+        updated_at = session_file.stat().st_mtime
+        if time.time() - updated_at > SESSION_TTL:
+            session_file.unlink()
+        else:
+            return updated_at, Session.from_dict(load_json(session_file.read_bytes()))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error("Failed to load session of user %s: %s", user_id, e)
+    return time.time(), Session.from_results([])
+
+def _write_session(user_id: int, data: bytes):
+    """
+    Write a serialized session to the user's session file.
+
+    Args:
+        user_id (int): Telegram user ID.
+        data (bytes): Serialized session data.
+    """
+    try:
+        _write_file_atomic(_session_file(user_id), data)
+    except Exception as e:
+        logger.error("Failed to save session of user %s: %s", user_id, e)
+
+async def set_session_async(user_id: int, session_data: Session):
     """
     Set session data for a user.
 
+    The cache is updated immediately and only this user's session file is
+    rewritten, from the default executor. Writes for the same user wait for
+    each other, so the file always ends up holding the latest session.
+
     Args:
         user_id (int): Telegram user ID.
-        session_data (dict): Session data to set.
+        session_data (Session): Session data to set.
     """
-    if "user_sessions" not in config:
-        config["user_sessions"] = {}
-    config["user_sessions"][str(user_id)] = session_data
-    save_config()
+    _session_cache[user_id] = (time.time(), session_data)
+    data = dump_json(session_data.to_dict())
+    lock = _session_write_locks.get(user_id)
+    if lock is None:
+        lock = _session_write_locks[user_id] = asyncio.Lock()
+    async with lock:
+        await asyncio.get_running_loop().run_in_executor(None, _write_session, user_id, data)
+
+# =====================
+# BotSettings Snapshot
+# =====================
+
+@dataclass(frozen=True)
+class BotSettings:
+    """
+    Immutable snapshot of the runtime settings stored in config.json.
+    """
+
+    __slots__ = (
+        "telegram_api_id",
+        "telegram_api_hash",
+        "telegram_string_session",
+        "target_channel_username",
+        "apify_api_token",
+        "invite_rate",
+    )
+
+    telegram_api_id: Optional[int]
+    telegram_api_hash: Optional[str]
+    telegram_string_session: Optional[str]
+    target_channel_username: Optional[str]
+    apify_api_token: Optional[str]
+    invite_rate: Optional[float]
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "BotSettings":
+        """
+        Build a snapshot from the configuration dictionary.
+
+        Args:
+            config (dict): Current configuration.
+
+        Returns:
+            BotSettings: Snapshot of the runtime settings.
+        """
+        return cls(*(config.get(name) for name in cls.__slots__))
 
 # =====================
 # TelegramChecker Class
@@ -180,6 +520,26 @@ class TelegramChecker:
     A class to check if phone numbers are registered on Telegram using Apify.
     """
 
+    # Apify actor used to check phone numbers and the number of phones sent per run
+    ACTOR_ID = "wilcode/telegram-phone-number-checker"
+    BATCH_SIZE = 10
+
+    # Number of checker workers per pipeline, and the maximum number of actor runs in flight
+    # at the same time across all pipelines (e.g. two admins uploading CSVs at once)
+    MAX_CONCURRENT_RUNS = 8
+
+    # Capacity (in batches) of each bounded queue in the checking pipeline
+    PIPELINE_QUEUE_SIZE = 100
+
+    # Retry policy for Apify API requests
+    MAX_RETRIES = 3
+    MIN_RETRY_DELAY_MILLIS = 500
+
+    # Results are reused for numbers checked within RESULT_CACHE_TTL seconds,
+    # keeping at most RESULT_CACHE_SIZE numbers
+    RESULT_CACHE_TTL = 24 * 3600
+    RESULT_CACHE_SIZE = 100000
+
     def __init__(self, api_token: str, proxy_config: Dict[str, Any] = None):
         """
         Initialize the TelegramChecker with API token and optional proxy configuration.
@@ -188,104 +548,315 @@ class TelegramChecker:
             api_token (str): Your Apify API token.
             proxy_config (dict, optional): Proxy configuration for Apify. Defaults to None.
         """
-        self.client = ApifyClient(api_token)
+        self.api_token = api_token
+        # A single client keeps one pooled keep-alive HTTP session for all batches
+        self.client = self._create_client(api_token)
         self.proxy_config = proxy_config or {"useApifyProxy": True, "apifyProxyGroups": ["SHADER"]}
+        # Limits actor runs across pipelines; created on first use, inside the running event loop
+        self._run_semaphore: Optional[asyncio.Semaphore] = None
+        # Recent results keyed by phone number, oldest first: phone -> (time.monotonic() of the check, result)
+        self._result_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
         logger.info("TelegramChecker initialized.")
 
-    def read_csv(self, file_path: str) -> List[str]:
+    def _create_client(self, api_token: str) -> ApifyClientAsync:
+        """
+        Create the Apify client used for all actor runs.
+
+        Args:
+            api_token (str): Your Apify API token.
+
+        Returns:
+            ApifyClientAsync: Client with the checker's retry policy.
+        """
+        # min_delay_between_retries_millis is the apify-client 1.x API (pinned in requirements.txt);
+        # 2.x+ replaced it with a timedelta min_delay_between_retries
+        return ApifyClientAsync(
+            api_token,
+            max_retries=self.MAX_RETRIES,
+            min_delay_between_retries_millis=self.MIN_RETRY_DELAY_MILLIS
+        )
+
+    def update_token(self, api_token: str):
+        """
+        Switch to a new Apify API token, keeping the result cache and the run limit.
+
+        Args:
+            api_token (str): Your new Apify API token.
+        """
+        self.api_token = api_token
+        # ApifyClientAsync has no public way to change the token of a live client
+        self.client = self._create_client(api_token)
+        logger.info("TelegramChecker API token updated.")
+
+    def _cached_result(self, phone: str) -> Optional[Dict[str, Any]]:
         """
-        Read phone numbers from a CSV file.
+        Return the cached result for a phone number, if it was checked recently.
 
         Args:
-            file_path (str): Path to the CSV file.
+            phone (str): Phone number.
 
         Returns:
-            list: List of phone numbers.
+            dict | None: The cached result, or None if there is no fresh one.
+        """
+        entry = self._result_cache.get(phone)
+        if entry is None:
+            return None
+        checked_at, result = entry
+        if time.monotonic() - checked_at > self.RESULT_CACHE_TTL:
+            del self._result_cache[phone]
+            return None
+        return result
+
+    def _cache_results(self, results: List[Dict[str, Any]]):
+        """
+        Store fresh checker results, evicting the oldest entries beyond RESULT_CACHE_SIZE.
+
+        Args:
+            results (list): Results of one actor run.
+        """
+        now = time.monotonic()
+        for result in results:
+            phone = result.get("phoneNumber")
+            if phone:
+                self._result_cache[phone] = (now, result)
+                self._result_cache.move_to_end(phone)
+        while len(self._result_cache) > self.RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+
+    def iter_phone_numbers(self, content: Union[bytes, bytearray]) -> Iterator[str]:
+        """
+        Lazily read phone numbers from CSV content already in memory.
+
+        Args:
+            content (bytes | bytearray): The raw CSV bytes (e.g. a downloaded upload).
+
+        Yields:
+            str: Phone numbers from the first column, one at a time.
+
+        Raises:
+            Exception: Any error while reading the CSV (e.g. UnicodeDecodeError or csv.Error) is logged
+                and re-raised, so callers never mistake a truncated read for the whole file.
         """
-        phone_numbers = []
+        count = 0
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                csv_reader = csv.reader(file)
-                for row in csv_reader:
-                    if row:
-                        phone = row[0].strip()
-                        if phone:
-                            phone_numbers.append(phone)
-            logger.info(f"Read {len(phone_numbers)} phone numbers from CSV.")
+            for phone in self._scan_first_column(content):
+                count += 1
+                yield phone
+            logger.info("Read %d phone numbers from CSV.", count)
         except Exception as e:
-            logger.error(f"Error reading CSV file {file_path}: {e}")
-        return phone_numbers
+            logger.error("Error reading CSV content after %d phone numbers: %s", count, e)
+            raise
 
-    async def check_telegram_status(self, phone_numbers: List[str]) -> List[Dict[str, Any]]:
+    def _scan_first_column(self, content: Union[bytes, bytearray]) -> Iterator[str]:
         """
-        Check if phone numbers are registered on Telegram.
+        Yield the non-empty, stripped first-column values of CSV data.
+
+        Data without quoted fields is scanned line by line, taking everything
+        before the first comma; quoted data falls back to csv.reader.
 
         Args:
-            phone_numbers (list): List of phone numbers to check.
+            content (bytes | bytearray): The raw CSV bytes.
 
-        Returns:
-            list: Results from the Telegram checker.
+        Yields:
+            str: First-column values.
         """
-        results = []
-        for i in range(0, len(phone_numbers), 10):  # Process in batches of 10
-            batch = phone_numbers[i:i+10]
-            logger.info(f"Checking batch: {batch}")
-            run_input = {
-                "phoneNumbers": batch,
-                "proxyConfiguration": self.proxy_config
-            }
-            try:
-                run = await self.client.actor("wilcode/telegram-phone-number-checker").call(run_input=run_input)
-                run_id = run["id"]
-                logger.info(f"Actor run started with run_id: {run_id}")
-                
-                # Wait for the actor run to finish
-                run_finished = False
-                while not run_finished:
-                    run_info = await self.client.run(run_id).get()
-                    status = run_info.get('status')
-                    logger.info(f"Actor run status: {status}")
-                    if status == 'SUCCEEDED':
-                        run_finished = True
-                    elif status in ['FAILED', 'TIMED_OUT', 'CANCELED']:
-                        logger.error(f"Actor run failed with status: {status}")
-                        break
-                    else:
-                        await asyncio.sleep(10)  # Wait before checking again
-
-                if run_finished:
-                    dataset_id = run_info["defaultDatasetId"]
-                    dataset = self.client.dataset(dataset_id)
-                    async for item in dataset.iterate_items():
-                        results.append(item)
-                    logger.info(f"Batch {i//10 + 1} processed successfully.")
-                else:
-                    logger.error(f"Actor run for batch {batch} did not complete successfully.")
-            except Exception as e:
-                logger.error(f"Error processing batch {batch}: {e}")
-        logger.info(f"Total results obtained: {len(results)}")
-        return results
+        if content.find(b'"') == -1:
+            yield from self._scan_unquoted_lines(content)
+        else:
+            yield from self._scan_csv_rows(io.StringIO(content.decode("utf-8"), newline=""))
 
-    def save_results(self, results: List[Dict[str, Any]], output_file: str):
+    @staticmethod
+    def _scan_unquoted_lines(buffer: Union[bytes, bytearray]) -> Iterator[str]:
         """
-        Save the results to a CSV file.
+        Yield the first field of each non-empty line of an unquoted CSV buffer.
+
+        Lines may end in "\\n", "\\r\\n" or a bare "\\r", as csv.reader accepts.
 
         Args:
-            results (list): Results from the Telegram checker.
-            output_file (str): Path to the output CSV file.
+            buffer (bytes | bytearray): CSV data without quote characters.
+
+        Yields:
+            str: First-column values.
         """
+        size = len(buffer)
+        pos = 0
+        while pos < size:
+            newline = buffer.find(b"\n", pos)
+            if newline == -1:
+                newline = size
+            # "\r" ends a line too; with "\r\n" it only leaves an empty piece, which is skipped
+            for line in buffer[pos:newline].split(b"\r"):
+                phone = line.split(b",", 1)[0].strip()
+                if phone:
+                    yield phone.decode("utf-8")
+            pos = newline + 1
+
+    @staticmethod
+    def _scan_csv_rows(file: TextIO) -> Iterator[str]:
+        """
+        Yield the first field of each non-empty row using csv.reader.
+
+        Args:
+            file (TextIO): Open text stream with CSV data.
+
+        Yields:
+            str: First-column values.
+        """
+        phones = (row[0].strip() for row in csv.reader(file) if row)
+        yield from filter(None, phones)
+
+    async def _check_batch(self, batch_number: int, batch: List[str]) -> List[Dict[str, Any]]:
+        """
+        Run the Apify actor for a single batch of phone numbers.
+
+        Args:
+            batch_number (int): 1-based index of the batch, used for logging.
+            batch (list): Phone numbers in this batch.
+
+        Returns:
+            list: Dataset items produced by the actor run (empty if the run failed).
+        """
+        run_input = {
+            "phoneNumbers": batch,
+            "proxyConfiguration": self.proxy_config
+        }
+        items = []
         try:
-            with open(output_file, "w", newline="", encoding="utf-8") as file:
-                csv_writer = csv.writer(file)
-                csv_writer.writerow(["Phone Number", "Registered on Telegram", "Telegram User ID"])
-                for result in results:
-                    phone = result.get("phoneNumber")
-                    is_registered = result.get("isRegistered")
-                    user_id = result.get("userId") if is_registered else ""
-                    csv_writer.writerow([phone, is_registered, user_id])
-            logger.info(f"Results saved to {output_file}.")
+            async with self._run_semaphore:
+                logger.info("Checking batch %d: %s", batch_number, batch)
+                # call() waits for the actor run to finish before returning
+                run = await self.client.actor(self.ACTOR_ID).call(run_input=run_input)
+            status = run.get("status") if run else None
+            if status != "SUCCEEDED":
+                logger.error("Actor run for batch %s did not complete successfully (status: %s).", batch, status)
+                return items
+            logger.info("Actor run %s for batch %d finished.", run["id"], batch_number)
+            dataset = self.client.dataset(run["defaultDatasetId"])
+            async for item in dataset.iterate_items():
+                items.append(item)
         except Exception as e:
-            logger.error(f"Failed to save results to {output_file}: {e}")
+            logger.error("Error processing batch %s: %s", batch, e)
+            return []
+        self._cache_results(items)
+        logger.info("Batch %d processed successfully.", batch_number)
+        return items
+
+    async def iter_batch_results(self, phone_numbers: Iterable[str]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Check phone numbers through a bounded producer/consumer pipeline, yielding each batch's results as it finishes.
+
+        A producer groups the numbers into BATCH_SIZE batches on a bounded queue,
+        MAX_CONCURRENT_RUNS workers run the actor for each batch and push the
+        items onto a second bounded queue, which this generator drains. The
+        bounded queues apply back-pressure, so a slow consumer pauses the reader.
+        Numbers checked within RESULT_CACHE_TTL are answered from the cache
+        without an actor run. Batches are yielded in completion order, not input order.
+
+        Args:
+            phone_numbers (iterable): Phone numbers to check (e.g. from iter_phone_numbers()).
+
+        Yields:
+            list: Results of one finished batch.
+        """
+        if self._run_semaphore is None:
+            self._run_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_RUNS)
+        batch_queue: asyncio.Queue = asyncio.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+        result_queue: asyncio.Queue = asyncio.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+
+        async def produce():
+            batch_number = 0
+            batch = []
+            cached = []
+            try:
+                for phone in phone_numbers:
+                    result = self._cached_result(phone)
+                    if result is not None:
+                        cached.append(result)
+                        if len(cached) == self.BATCH_SIZE:
+                            await result_queue.put(cached)
+                            cached = []
+                        continue
+                    batch.append(phone)
+                    if len(batch) == self.BATCH_SIZE:
+                        batch_number += 1
+                        await batch_queue.put((batch_number, batch))
+                        batch = []
+                if cached:
+                    await result_queue.put(cached)
+                if batch:
+                    await batch_queue.put((batch_number + 1, batch))
+            finally:
+                # One end marker per worker
+                for _ in range(self.MAX_CONCURRENT_RUNS):
+                    await batch_queue.put(None)
+
+        async def work():
+            while (job := await batch_queue.get()) is not None:
+                await result_queue.put(await self._check_batch(*job))
+            await result_queue.put(None)
+
+        tasks = [asyncio.ensure_future(produce())]
+        tasks += [asyncio.ensure_future(work()) for _ in range(self.MAX_CONCURRENT_RUNS)]
+        try:
+            finished_workers = 0
+            while finished_workers < self.MAX_CONCURRENT_RUNS:
+                batch_results = await result_queue.get()
+                if batch_results is None:
+                    finished_workers += 1
+                    continue
+                yield batch_results
+            # Surface errors raised while reading the input
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # Header row of the results CSV
+    RESULT_HEADER = ("Phone Number", "Registered on Telegram", "Telegram User ID")
+
+    @staticmethod
+    def _result_rows(results: Iterable[Dict[str, Any]]) -> Iterator[tuple]:
+        """
+        Convert checker results into CSV rows.
+
+        Args:
+            results (iterable): Results from the Telegram checker.
+
+        Yields:
+            tuple: Phone number, registration flag and user ID (empty if not registered).
+        """
+        for r in results:
+            is_registered = r.get("isRegistered")
+            yield r.get("phoneNumber"), is_registered, r.get("userId", "") if is_registered else ""
+
+    async def check_and_write(
+        self,
+        phone_numbers: Iterable[str],
+        output: TextIO,
+        progress: Callable[[int], Awaitable] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Check phone numbers and write each batch as CSV rows to output as soon as it finishes.
+
+        Args:
+            phone_numbers (iterable): Phone numbers to check, e.g. from iter_phone_numbers().
+            output (TextIO): Text stream opened with newline="" (e.g. io.StringIO(newline="")).
+            progress (callable, optional): Coroutine function awaited after each batch
+                with the number of results so far. Defaults to None.
+
+        Returns:
+            list: Results from the Telegram checker, for callers that need to keep them.
+        """
+        results = []
+        csv_writer = csv.writer(output)
+        csv_writer.writerow(self.RESULT_HEADER)
+        async for batch_results in self.iter_batch_results(phone_numbers):
+            csv_writer.writerows(self._result_rows(batch_results))
+            results.extend(batch_results)
+            if progress is not None:
+                await progress(len(results))
+        logger.info("Total results obtained: %d.", len(results))
+        return results
 
     def display_results(self, results: List[Dict[str, Any]]):
         """
@@ -294,9 +865,14 @@ class TelegramChecker:
         Args:
             results (list): Results from the Telegram checker.
         """
+        if not logger.isEnabledFor(logging.INFO):
+            return
         logger.info("Telegram Checker Results:")
         for result in results:
-            logger.info(f"Phone Number: {result.get('phoneNumber')} - Registered: {result.get('isRegistered')} - User ID: {result.get('userId', 'N/A')}")
+            logger.info(
+                "Phone Number: %s - Registered: %s - User ID: %s",
+                result.get("phoneNumber"), result.get("isRegistered"), result.get("userId", "N/A")
+            )
 
 # =====================
 # TelegramAdder Class
@@ -307,7 +883,35 @@ class TelegramAdder:
     A class to add users to a Telegram channel using Telethon.
     """
 
-    def __init__(self, api_id: int, api_hash: str, string_session: str, target_channel_username: str):
+    # Maximum number of invite requests in flight at the same time
+    MAX_CONCURRENT_INVITES = 10
+
+    # Number of users sent in a single InviteToChannelRequest
+    INVITE_CHUNK_SIZE = 50
+
+    # Number of users resolved per batched lookup, and how many resolved users are cached across calls
+    RESOLVE_CHUNK_SIZE = 200
+    ENTITY_CACHE_SIZE = 10000
+
+    # Number of retries after a FloodWaitError, with exponential backoff between attempts
+    # plus up to FLOOD_JITTER seconds of random jitter
+    MAX_FLOOD_RETRIES = 3
+    FLOOD_BACKOFF_BASE = 1
+    FLOOD_JITTER = 2
+
+    # Flood waits longer than this (in seconds) are not slept through; invites are
+    # suspended until the wait is over instead
+    MAX_FLOOD_WAIT = 300
+
+    # Adaptive token bucket for invite requests: at most INVITE_RATE requests per INVITE_RATE_PERIOD
+    # seconds. The rate is halved after every FloodWaitError, but never below MIN_INVITE_RATE, and
+    # grows back by INVITE_RATE_STEP after every successful request
+    INVITE_RATE = 20
+    INVITE_RATE_PERIOD = 60
+    MIN_INVITE_RATE = 1
+    INVITE_RATE_STEP = 1
+
+    def __init__(self, api_id: int, api_hash: str, string_session: str, target_channel_username: str, invite_rate: float = None):
         """
         Initialize the TelegramAdder with API credentials and target channel.
 
@@ -316,22 +920,44 @@ class TelegramAdder:
             api_hash (str): Telegram API Hash.
             string_session (str): StringSession for Telethon.
             target_channel_username (str): Username of the target channel (e.g., @yourchannel).
+            invite_rate (float, optional): Invite requests allowed per INVITE_RATE_PERIOD, e.g. as learned
+                by a previous run. Defaults to None (INVITE_RATE).
         """
         self.api_id = api_id
         self.api_hash = api_hash
         self.string_session = string_session
         self.target_channel_username = target_channel_username
         self.client = TelegramClient(StringSession(self.string_session), self.api_id, self.api_hash)
+        self.invite_rate = min(max(invite_rate or self.INVITE_RATE, self.MIN_INVITE_RATE), self.INVITE_RATE)
+        # The bucket holds INVITE_RATE tokens; each request takes INVITE_RATE / invite_rate of them,
+        # so the rate adapts without replacing the bucket and losing its fill level
+        self.limiter = AsyncLimiter(self.INVITE_RATE, self.INVITE_RATE_PERIOD)
+        # time.time() until which Telegram asked us not to send invites
+        self.cooldown_until = 0.0
+        # LRU cache of resolved user entities, keyed by user ID
+        self._entity_cache: "OrderedDict[int, Any]" = OrderedDict()
+        # Set once the session has been confirmed as authorized
+        self._authorized = False
+        # Input peer of the target channel, resolved on first use
+        self._target_channel: Any = None
         logger.info("TelegramAdder initialized.")
 
     async def connect(self):
         """
-        Connect to Telegram.
+        Connect to Telegram, unless the client is still connected and authorized from an earlier call.
+
+        The StringSession already carries the auth key and data center, so only
+        the first connection checks the authorization with an extra request.
         """
+        if self._authorized and self.client.is_connected():
+            return
         await self.client.connect()
+        if self._authorized:
+            return
         if not await self.client.is_user_authorized():
             logger.error("Telethon client is not authorized. Please ensure the bot is authorized.")
             raise ValueError("Telethon client is not authorized.")
+        self._authorized = True
 
     async def disconnect(self):
         """
@@ -340,13 +966,249 @@ class TelegramAdder:
         await self.client.disconnect()
         logger.info("Telethon client disconnected.")
 
-    async def add_users_to_channel(self, user_ids: List[int], blocked_users: List[int]) -> Dict[str, List[int]]:
+    def set_target_channel(self, target_channel_username: str):
+        """
+        Switch to another target channel, keeping the client, its connection and its caches.
+
+        Args:
+            target_channel_username (str): Username of the new target channel (e.g., @yourchannel).
+        """
+        self.target_channel_username = target_channel_username
+        self._target_channel = None
+        logger.info("Target channel changed to %s.", target_channel_username)
+
+    async def _get_target_channel(self) -> Any:
+        """
+        Return the input peer of the target channel, resolving the username only once.
+
+        Returns:
+            Any: Input peer (id and access hash) of the target channel.
+        """
+        if self._target_channel is None:
+            self._target_channel = await self.client.get_input_entity(self.target_channel_username)
+            logger.info("Target channel %s resolved.", self.target_channel_username)
+        return self._target_channel
+
+    async def _invite(self, target_channel: Any, users: List[Any]) -> Any:
+        """
+        Send a single InviteToChannelRequest, retrying on flood waits.
+
+        Args:
+            target_channel (Any): Resolved target channel entity.
+            users (list): Resolved user entities to invite.
+
+        Returns:
+            Any: The Telegram response to the invite request.
+
+        Raises:
+            errors.FloodWaitError: If the request is still flood-limited after MAX_FLOOD_RETRIES retries,
+                or the flood wait is longer than MAX_FLOOD_WAIT, or invites are still suspended after
+                an earlier long flood wait (then no request is sent).
+        """
+        request = functions.channels.InviteToChannelRequest(
+            channel=target_channel,
+            users=users
+        )
+        for attempt in range(self.MAX_FLOOD_RETRIES + 1):
+            await self.limiter.acquire(self.INVITE_RATE / self.invite_rate)
+            # Another request may have started a cooldown while this one waited for the limiter
+            cooldown = self.cooldown_remaining()
+            if cooldown:
+                raise errors.FloodWaitError(request, capture=cooldown)
+            try:
+                result = await self.client(request)
+                self._speed_up()
+                return result
+            except errors.FloodWaitError as e:
+                self._slow_down()
+                if e.seconds > self.MAX_FLOOD_WAIT:
+                    self.cooldown_until = max(self.cooldown_until, time.time() + e.seconds)
+                    logger.warning("Flood wait of %s seconds. Suspending invites until it is over.", e.seconds)
+                    raise
+                if attempt == self.MAX_FLOOD_RETRIES:
+                    raise
+                delay = max(e.seconds, self.FLOOD_BACKOFF_BASE * 2 ** attempt) + random.uniform(0, self.FLOOD_JITTER)
+                logger.warning("Flood wait error: %s. Sleeping for %.1f seconds.", e, delay)
+                await asyncio.sleep(delay)
+
+    def cooldown_remaining(self) -> int:
+        """
+        Return how long invites are still suspended after a long flood wait.
+
+        Returns:
+            int: Remaining seconds, or 0 if invites may be sent.
+        """
+        return max(0, int(self.cooldown_until - time.time()))
+
+    def _slow_down(self):
+        """
+        Halve the invite rate after a flood wait, down to MIN_INVITE_RATE.
+        """
+        new_rate = max(self.MIN_INVITE_RATE, self.invite_rate / 2)
+        if new_rate < self.invite_rate:
+            self.invite_rate = new_rate
+            logger.warning("Reduced invite rate to %s requests per %s seconds.", new_rate, self.INVITE_RATE_PERIOD)
+
+    def _speed_up(self):
+        """
+        Raise the invite rate by INVITE_RATE_STEP after a successful request, up to INVITE_RATE.
+        """
+        self.invite_rate = min(self.INVITE_RATE, self.invite_rate + self.INVITE_RATE_STEP)
+
+    def _log_invite_failure(self, user_id: int, error: Exception):
+        """
+        Log why a user could not be added to the target channel.
+
+        Args:
+            user_id (int): Telegram user ID that failed.
+            error (Exception): The error raised while inviting the user.
+        """
+        if isinstance(error, errors.FloodWaitError):
+            logger.warning("Flood wait error for user %s: %s. Giving up.", user_id, error)
+        elif isinstance(error, errors.UserPrivacyRestrictedError):
+            logger.warning("User %s has privacy settings that prevent adding to channels.", user_id)
+        elif isinstance(error, errors.UserAlreadyParticipantError):
+            logger.info("User %s is already a participant of the channel.", user_id)
+        elif isinstance(error, errors.ChatWriteForbiddenError):
+            logger.error("Bot does not have permission to write in the target channel %s.", self.target_channel_username)
+        else:
+            logger.error("Failed to add user %s to channel: %s", user_id, error)
+
+    def _cache_entity(self, user_id: int, entity: Any):
+        """
+        Store a resolved user entity in the LRU cache.
+
+        Args:
+            user_id (int): Telegram user ID.
+            entity (Any): Resolved user entity.
+        """
+        self._entity_cache[user_id] = entity
+        self._entity_cache.move_to_end(user_id)
+        if len(self._entity_cache) > self.ENTITY_CACHE_SIZE:
+            self._entity_cache.popitem(last=False)
+
+    async def _resolve_user(self, user_id: int, semaphore: asyncio.Semaphore) -> Any:
+        """
+        Resolve a single user ID to an entity.
+
+        Args:
+            user_id (int): Telegram user ID to resolve.
+            semaphore (asyncio.Semaphore): Limits the number of concurrent lookups.
+
+        Returns:
+            Any: Resolved user entity.
+        """
+        async with semaphore:
+            return await self.client.get_entity(user_id)
+
+    async def _resolve_users(self, user_ids: List[int]) -> Tuple[Dict[int, Any], List[int]]:
+        """
+        Resolve user IDs to entities, using the cache and batched lookups.
+
+        Cache misses are resolved RESOLVE_CHUNK_SIZE at a time with a single
+        get_entity call (one GetUsersRequest); if a batch fails, its users are
+        resolved one by one, at most MAX_CONCURRENT_INVITES at a time.
+
+        Args:
+            user_ids (list): Telegram user IDs to resolve.
+
+        Returns:
+            tuple: Mapping of resolved user IDs to entities, and the list of user IDs that failed.
+        """
+        resolved = {}
+        failed = []
+        missing = []
+        # Bounds the single-user lookups of a failed batch, so they do not all go out at once
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_INVITES)
+        for user_id in user_ids:
+            entity = self._entity_cache.get(user_id)
+            if entity is None:
+                missing.append(user_id)
+            else:
+                self._entity_cache.move_to_end(user_id)
+                resolved[user_id] = entity
+
+        for i in range(0, len(missing), self.RESOLVE_CHUNK_SIZE):
+            chunk = missing[i:i + self.RESOLVE_CHUNK_SIZE]
+            try:
+                entities = await self.client.get_entity(chunk)
+            except Exception as e:
+                logger.warning("Batched lookup of %d users failed (%s). Resolving one by one.", len(chunk), e)
+                entities = await asyncio.gather(
+                    *(self._resolve_user(user_id, semaphore) for user_id in chunk),
+                    return_exceptions=True
+                )
+            for user_id, entity in zip(chunk, entities):
+                if isinstance(entity, Exception):
+                    self._log_invite_failure(user_id, entity)
+                    failed.append(user_id)
+                else:
+                    resolved[user_id] = entity
+                    self._cache_entity(user_id, entity)
+        return resolved, failed
+
+    async def _invite_chunk(self, target_channel: Any, resolved: Dict[int, Any], semaphore: asyncio.Semaphore) -> Tuple[List[int], List[int]]:
+        """
+        Invite a chunk of users with a single request.
+
+        If the batched request fails, each user is retried on their own so that
+        failures are attributed to the right users.
+
+        Args:
+            target_channel (Any): Resolved target channel entity.
+            resolved (dict): Mapping of Telegram user IDs to resolved entities.
+            semaphore (asyncio.Semaphore): Limits the number of concurrent invite requests.
+
+        Returns:
+            tuple: Lists of added and failed user IDs.
+        """
+        added, failed = [], []
+        async with semaphore:
+            try:
+                result = await self._invite(target_channel, list(resolved.values()))
+            except Exception as e:
+                if len(resolved) == 1:
+                    user_id = next(iter(resolved))
+                    self._log_invite_failure(user_id, e)
+                    failed.append(user_id)
+                    return added, failed
+                if self.cooldown_remaining():
+                    # Individual retries would hit the same flood wait
+                    failed.extend(resolved)
+                    return added, failed
+                logger.warning("Batched invite of %d users failed (%s). Retrying one by one.", len(resolved), e)
+                for user_id, entity in resolved.items():
+                    try:
+                        await self._invite(target_channel, [entity])
+                        added.append(user_id)
+                    except Exception as user_error:
+                        self._log_invite_failure(user_id, user_error)
+                        failed.append(user_id)
+                return added, failed
+
+            # Newer API layers report users that could not be invited instead of raising
+            missing = {invitee.user_id for invitee in getattr(result, "missing_invitees", None) or []}
+            for user_id in resolved:
+                if user_id in missing:
+                    logger.warning("User %s could not be invited to the channel.", user_id)
+                    failed.append(user_id)
+                else:
+                    added.append(user_id)
+            logger.info("Added %d users to channel in one request.", len(resolved) - len(missing))
+        return added, failed
+
+    async def add_users_to_channel(
+        self,
+        user_ids: List[int],
+        progress: Callable[[int, int], Awaitable] = None
+    ) -> Dict[str, List[int]]:
         """
         Add users to the target channel.
 
         Args:
-            user_ids (list): List of Telegram user IDs to add.
-            blocked_users (list): List of Telegram user IDs to block.
+            user_ids (list): Unique Telegram user IDs to add, with blocked users already removed.
+            progress (callable, optional): Coroutine function awaited after each invite chunk
+                with the number of users processed so far and the total. Defaults to None.
 
         Returns:
             dict: Summary of added and failed users.
@@ -356,56 +1218,144 @@ class TelegramAdder:
             "failed": []
         }
         try:
-            target_channel = await self.client.get_entity(self.target_channel_username)
-            logger.info(f"Target channel {self.target_channel_username} retrieved.")
+            target_channel = await self._get_target_channel()
         except ValueError:
-            logger.error(f"Target channel {self.target_channel_username} not found. Please verify the username.")
+            logger.error("Target channel %s not found. Please verify the username.", self.target_channel_username)
             raise ValueError(f"Target channel {self.target_channel_username} not found. Please verify the username.")
         except errors.ChatAdminRequiredError:
-            logger.error(f"Bot lacks admin permissions in the target channel {self.target_channel_username}.")
+            logger.error("Bot lacks admin permissions in the target channel %s.", self.target_channel_username)
             raise PermissionError(f"Bot lacks admin permissions in the target channel {self.target_channel_username}.")
         except Exception as e:
-            logger.error(f"Failed to get target channel {self.target_channel_username}: {e}")
+            logger.error("Failed to get target channel %s: %s", self.target_channel_username, e)
             raise ValueError(f"Failed to get target channel {self.target_channel_username}: {e}")
 
-        for user_id in user_ids:
-            if user_id in blocked_users:
-                logger.info(f"User {user_id} is blocked. Skipping.")
-                continue
-            try:
-                user = await self.client.get_entity(user_id)
-                await self.client(functions.channels.InviteToChannelRequest(
-                    channel=target_channel,
-                    users=[user]
-                ))
-                summary["added"].append(user_id)
-                logger.info(f"Added user {user_id} to channel.")
-                await asyncio.sleep(1)  # To respect rate limits
-            except errors.FloodWaitError as e:
-                logger.warning(f"Flood wait error: {e}. Sleeping for {e.seconds} seconds.")
-                await asyncio.sleep(e.seconds)
-                summary["failed"].append(user_id)
-                continue
-            except errors.UserPrivacyRestrictedError:
-                logger.warning(f"User {user_id} has privacy settings that prevent adding to channels.")
-                summary["failed"].append(user_id)
-                continue
-            except errors.UserAlreadyParticipantError:
-                logger.info(f"User {user_id} is already a participant of the channel.")
-                summary["failed"].append(user_id)
-                continue
-            except errors.ChatWriteForbiddenError:
-                logger.error(f"Bot does not have permission to write in the target channel {self.target_channel_username}.")
-                summary["failed"].append(user_id)
-                continue
-            except Exception as e:
-                logger.error(f"Failed to add user {user_id} to channel: {e}")
-                summary["failed"].append(user_id)
-                continue
-
-        logger.info(f"Users added: {summary['added']}, Users failed: {summary['failed']}")
+        resolved, unresolved = await self._resolve_users(user_ids)
+        summary["failed"].extend(unresolved)
+
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_INVITES)
+        resolved_iter = iter(resolved.items())
+        chunks = []
+        while chunk := dict(islice(resolved_iter, self.INVITE_CHUNK_SIZE)):
+            chunks.append(chunk)
+        # Users that could not be resolved count as processed
+        processed = len(unresolved)
+
+        async def invite_chunk(chunk: Dict[int, Any]) -> Tuple[List[int], List[int]]:
+            nonlocal processed
+            outcome = await self._invite_chunk(target_channel, chunk, semaphore)
+            processed += len(chunk)
+            if progress is not None:
+                await progress(processed, len(user_ids))
+            return outcome
+
+        outcomes = await asyncio.gather(*(invite_chunk(chunk) for chunk in chunks))
+        for added, failed in outcomes:
+            summary["added"].extend(added)
+            summary["failed"].extend(failed)
+
+        logger.info("Users added: %s, Users failed: %s", summary["added"], summary["failed"])
         return summary
 
+# =====================
+# Input Validation Patterns
+# =====================
+
+# Telegram API IDs are short positive integers
+API_ID_REGEX = re.compile(r"\A\d{1,12}\Z")
+
+# Phone numbers in international format, e.g. +1234567890
+PHONE_REGEX = re.compile(r"\A\+\d{6,15}\Z")
+
+# Telegram usernames are between 5-32 characters and can include underscores
+USERNAME_REGEX = re.compile(r'^@[\w]{5,32}$')
+
+# Plain text messages that are not commands, i.e. answers to the bot's prompts
+TEXT_INPUT_FILTER = filters.TEXT & ~filters.COMMAND
+
+# =====================
+# Static Messages
+# =====================
+
+# Greeting shown with the main menu
+WELCOME_TEXT = "سلام! لطفاً یکی از گزینه‌های زیر را انتخاب کنید:"
+
+# Reply to anyone who is not an admin
+ACCESS_DENIED_TEXT = "❌ شما اجازه استفاده از این ربات را ندارید."
+
+# Reply sent when handling an update fails
+ERROR_REPLY_TEXT = "❌ متاسفانه یک خطا رخ داد. لطفاً دوباره تلاش کنید."
+
+# Errors for which no reply is sent: the reply would hit the same rate limit or timeout.
+# Not NetworkError itself, since BadRequest and other API errors subclass it and still get a reply
+TRANSIENT_ERRORS = (RetryAfter, TimedOut)
+
+# Shown with the main menu after /cancel
+CANCEL_TEXT = "📴 عملیات جاری لغو شد.\n\nلطفاً یکی از گزینه‌های زیر را انتخاب کنید:"
+
+# Heading of the settings menu
+SETTINGS_MENU_TEXT = (
+    "⚙️ <b>تنظیمات ربات:</b>\n\n"
+    "لطفاً یکی از تنظیمات زیر را انتخاب کنید تا مقدار آن را وارد یا به‌روزرسانی کنید:"
+)
+
+# Reply to /help, sent with ParseMode.HTML
+HELP_TEXT = (
+    "📄 <b>دستورات و گزینه‌ها:</b>\n\n"
+    "/start - شروع ربات و نمایش گزینه‌ها\n"
+    "/help - نمایش پیام راهنما\n"
+    "/cancel - لغو عملیات جاری\n"
+    "/status - نمایش وضعیت فعلی ربات\n\n"
+    "<b>گزینه‌ها (از طریق دکمه‌ها):</b>\n"
+    "• ⚙️ تنظیمات\n"
+    "• 📂 آپلود مخاطبین CSV\n"
+    "• ➕ افزودن کاربران به کانال هدف\n"
+    "• 🛑 مدیریت کاربران مسدود شده\n"
+    "• 📤 صادرات داده‌ها\n"
+    "• ❌ خروج کامل\n\n"
+    "<b>نکات:</b>\n"
+    "- فایل‌های CSV باید حاوی شماره تلفن‌ها در فرمت بین‌المللی (مثلاً +1234567890) باشند.\n"
+    "- فقط کاربرانی که در لیست ادمین‌ها هستند می‌توانند از این ربات استفاده کنند.\n"
+    "- پس از آپلود CSV و پردازش، می‌توانید کاربران ثبت‌شده را به کانال هدف اضافه کنید."
+)
+
+# =====================
+# Static Keyboards
+# =====================
+
+# Keyboards never change, so they are built once and shared by every update
+
+# "Back to main menu" row, shared by the sub-menus
+BACK_TO_MAIN_ROW = (InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main"),)
+
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⚙️ تنظیمات", callback_data="settings")],
+    [
+        InlineKeyboardButton("📂 آپلود مخاطبین CSV", callback_data="upload_csv"),
+        InlineKeyboardButton("➕ افزودن کاربران به کانال هدف", callback_data="add_to_channel")
+    ],
+    [InlineKeyboardButton("🛑 مدیریت کاربران مسدود شده", callback_data="manage_blocked")],
+    [
+        InlineKeyboardButton("📤 صادرات داده‌ها", callback_data="export_data"),
+        InlineKeyboardButton("❌ خروج کامل", callback_data="exit")
+    ],
+])
+
+SETTINGS_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔧 تولید String Session", callback_data="generate_string_session"),
+     InlineKeyboardButton("🔧 تنظیم Apify API Token", callback_data="set_apify_token")],
+    [InlineKeyboardButton("🔧 تنظیم Target Channel Username", callback_data="set_channel_username")],
+    BACK_TO_MAIN_ROW,
+])
+
+EXPORT_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📥 صادرات لیست کاربران ثبت‌شده", callback_data="export_registered_users")],
+    [InlineKeyboardButton("🔢 لیست شناسه‌های کاربران ثبت‌شده", callback_data="list_user_ids")],
+    BACK_TO_MAIN_ROW,
+])
+
+# First row of the manage blocked users menu, above the per-user unblock buttons
+BLOCK_USER_ROW = (InlineKeyboardButton("➕ مسدود کردن کاربر جدید", callback_data="block_user_prompt"),)
+
 # =====================
 # Main Telegram Bot Class
 # =====================
@@ -432,6 +1382,29 @@ class TelegramBot:
     # Block User Conversation States
     BLOCK_USER_ID_STATE = 8
 
+    # Outgoing message rate, kept just under Telegram's ~30 messages/second bot limit,
+    # and the number of retries after a RetryAfter (429) response
+    MAX_MESSAGES_PER_SECOND = 28
+    MAX_SEND_RETRIES = 3
+
+    # Longer user ID lists are sent as a text file, since they would not fit in a 4096-character message
+    INLINE_USER_ID_LIMIT = 200
+
+    # Callback data of the unblock buttons, capturing the user ID
+    UNBLOCK_CALLBACK_PATTERN = re.compile(r"^unblock_user_(\d+)$")
+
+    # Number of blocked users listed per page of the manage blocked users menu,
+    # and the callback data of its page buttons, capturing the page number
+    BLOCKED_PAGE_SIZE = 10
+    BLOCKED_PAGE_CALLBACK_PATTERN = re.compile(r"^blocked_page_(\d+)$")
+
+    # Minimum number of seconds between progress updates while a CSV is checked
+    PROGRESS_INTERVAL = 5
+
+    # Number of times registering the webhook (or dropping it before polling) is retried
+    # on network errors and RetryAfter, instead of giving up on startup
+    BOOTSTRAP_RETRIES = 5
+
     def __init__(self, bot_token: str, webhook_url: str, host: str = "0.0.0.0", port: int = 8443):
         """
         Initialize the TelegramBot with necessary configurations.
@@ -451,12 +1424,53 @@ class TelegramBot:
         self.adder: TelegramAdder = None
         self.checker: TelegramChecker = None
 
-        # Initialize the Telegram bot application
-        self.application = ApplicationBuilder().token(bot_token).build()
+        # Snapshot of the runtime settings; refreshed by initialize_components()
+        self.settings: BotSettings = BotSettings.from_config(config)
+
+        # Initialize the Telegram bot application; every outgoing Bot API call
+        # (reply_text, edit_message_text, send_message, ...) goes through the rate limiter
+        self.application = (
+            ApplicationBuilder()
+            .token(bot_token)
+            .rate_limiter(AIORateLimiter(
+                overall_max_rate=self.MAX_MESSAGES_PER_SECOND,
+                overall_time_period=1,
+                max_retries=self.MAX_SEND_RETRIES
+            ))
+            .build()
+        )
 
         # Initialize ThreadPoolExecutor for asynchronous file operations
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=5)
 
+        # Per-chat FIFO queues of long-running jobs (CSV checks, channel invites) and the
+        # worker task draining each queue; a worker exits once its queue is empty
+        self._chat_queues: Dict[int, asyncio.Queue] = {}
+        self._chat_workers: Dict[int, asyncio.Task] = {}
+
+        # Set while users are being added to the channel; only one run at a time since the adder's client is shared
+        self._adding_users = False
+
+        # Adders replaced while a channel invite run may still be using their client;
+        # disconnected once no run is in progress
+        self._retired_adders: List[TelegramAdder] = []
+
+        # Set to stop the bot (by SIGINT/SIGTERM or the exit button); created by run() inside the event loop
+        self._stop_event: Optional[asyncio.Event] = None
+
+        # Callback data -> handler, used by button_handler
+        self._callback_dispatch = {
+            "settings": self.settings_menu,
+            "upload_csv": self.upload_csv_prompt,
+            "add_to_channel": self.add_to_channel_button,
+            "manage_blocked": self.manage_blocked_menu,
+            "export_data": self.export_data_menu,
+            "exit": self.exit_bot,
+            "back_to_main": self.start_command,
+            "export_registered_users": self.export_registered_users,
+            "list_user_ids": self.list_user_ids,
+        }
+
         # Register handlers
         self.register_handlers()
 
@@ -466,131 +1480,166 @@ class TelegramBot:
     def initialize_components(self):
         """
         Initialize TelegramAdder and TelegramChecker based on config.
+
+        Refreshes the settings snapshot first, so call this after any settings change.
         """
-        telegram_api_id = config.get("telegram_api_id")
-        telegram_api_hash = config.get("telegram_api_hash")
-        telegram_string_session = config.get("telegram_string_session")
-        target_channel_username = config.get("target_channel_username")
-        apify_api_token = config.get("apify_api_token")
+        self.settings = settings = BotSettings.from_config(config)
 
-        if all([telegram_api_id, telegram_api_hash, telegram_string_session, target_channel_username]):
+        credentials = (settings.telegram_api_id, settings.telegram_api_hash, settings.telegram_string_session)
+        adder_settings = (*credentials, settings.target_channel_username)
+        if self.adder and settings.target_channel_username and credentials == (
+                self.adder.api_id, self.adder.api_hash, self.adder.string_session):
+            # Keep the existing client, its connection and its caches; only the channel may have changed
+            if settings.target_channel_username != self.adder.target_channel_username:
+                self.adder.set_target_channel(settings.target_channel_username)
+        elif all(adder_settings):
+            self._retire_adder()
             try:
                 self.adder = TelegramAdder(
-                    api_id=telegram_api_id,
-                    api_hash=telegram_api_hash,
-                    string_session=telegram_string_session,
-                    target_channel_username=target_channel_username
+                    api_id=settings.telegram_api_id,
+                    api_hash=settings.telegram_api_hash,
+                    string_session=settings.telegram_string_session,
+                    target_channel_username=settings.target_channel_username,
+                    invite_rate=settings.invite_rate
                 )
                 logger.info("TelegramAdder initialized successfully.")
             except Exception as e:
-                logger.error(f"Failed to initialize TelegramAdder: {e}")
+                logger.error("Failed to initialize TelegramAdder: %s", e)
         else:
             logger.warning("TelegramAdder not initialized. Missing configurations.")
 
-        if apify_api_token:
+        if self.checker and self.checker.api_token == settings.apify_api_token:
+            # Keep the existing client and its connection pool
+            pass
+        elif self.checker and settings.apify_api_token:
+            # Results checked with the old token stay valid
+            self.checker.update_token(settings.apify_api_token)
+        elif settings.apify_api_token:
             try:
-                self.checker = TelegramChecker(apify_api_token)
+                self.checker = TelegramChecker(settings.apify_api_token)
                 logger.info("TelegramChecker initialized successfully.")
             except Exception as e:
-                logger.error(f"Failed to initialize TelegramChecker: {e}")
+                logger.error("Failed to initialize TelegramChecker: %s", e)
         else:
             logger.warning("TelegramChecker not initialized. Missing Apify API Token.")
 
+    def _retire_adder(self):
+        """
+        Drop the current TelegramAdder, disconnecting its client once no channel invite run is using it.
+        """
+        adder, self.adder = self.adder, None
+        if adder is None:
+            return
+        self._retired_adders.append(adder)
+        if not self._adding_users:
+            self._disconnect_retired_adders()
+
+    def _disconnect_retired_adders(self):
+        """
+        Disconnect the clients of retired adders in the background.
+
+        The tasks are created through the application, which keeps them
+        referenced and awaits them when it stops.
+        """
+        if not self._retired_adders:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop yet, so the clients were never connected
+            self._retired_adders.clear()
+            return
+        while self._retired_adders:
+            self.application.create_task(self._retired_adders.pop().disconnect())
+
     def register_handlers(self):
         """
         Register all handlers (commands, callbacks, message handlers).
         """
 
+        # -------- Admin Gate --------
+        # Runs before every other handler group and stops updates from non-admins
+        self.application.add_handler(TypeHandler(Update, self._admin_gate), group=-1)
+
         # -------- Command Handlers --------
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("cancel", self.cancel))
         self.application.add_handler(CommandHandler("status", self.status_command))  # Added /status command
 
-        # -------- CallbackQueryHandlers for Buttons --------
-        # Define patterns for callbacks
-        callback_patterns = [
-            "settings",
-            "upload_csv",
-            "add_to_channel",
-            "manage_blocked",
-            "export_data",
-            "exit",
-            "generate_string_session",
-            r"^unblock_user_\d+$",
-            "block_user_prompt",
-            "back_to_main",
-            "export_registered_users",
-            "list_user_ids"
-        ]
-
-        for pattern in callback_patterns:
-            self.application.add_handler(
-                CallbackQueryHandler(self.button_handler, pattern=pattern)
-            )
-
-        # -------- Conversation Handlers --------
-        # Handler for generating StringSession
-        conv_handler_generate_ss = ConversationHandler(
-            entry_points=[CallbackQueryHandler(self.start_generate_string_session, pattern='generate_string_session')],
-            states={
-                self.GENERATE_SS_API_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.generate_ss_api_id)],
-                self.GENERATE_SS_API_HASH: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.generate_ss_api_hash)],
-                self.GENERATE_SS_PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.generate_ss_phone)],
-                self.GENERATE_SS_CODE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.generate_ss_code)],
-                self.GENERATE_SS_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.generate_ss_password)],
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-            per_message=False  # Set per_message=False to allow both CallbackQueryHandler and MessageHandler
-        )
-        self.application.add_handler(conv_handler_generate_ss)
-
-        # Handler for setting Apify API Token
-        conv_handler_set_apify = ConversationHandler(
-            entry_points=[CallbackQueryHandler(self.start_set_apify_token, pattern='set_apify_token')],
-            states={
-                self.SET_APIFY_TOKEN_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.set_apify_token)]
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-            per_message=False  # Set per_message=False to allow both CallbackQueryHandler and MessageHandler
-        )
-        self.application.add_handler(conv_handler_set_apify)
-
-        # Handler for setting Channel Username
-        conv_handler_set_channel = ConversationHandler(
-            entry_points=[CallbackQueryHandler(self.start_set_channel_username, pattern='set_channel_username')],
-            states={
-                self.SET_CHANNEL_USERNAME_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.set_channel_username)]
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-            per_message=False  # Set per_message=False to allow both CallbackQueryHandler and MessageHandler
-        )
-        self.application.add_handler(conv_handler_set_channel)
-
-        # Handler for blocking a user
-        conv_handler_block_user = ConversationHandler(
-            entry_points=[CallbackQueryHandler(self.block_user_prompt, pattern='block_user_prompt')],
-            states={
-                self.BLOCK_USER_ID_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.block_user_input_handler)]
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-            allow_reentry=True,
-            per_message=False  # Set per_message=False to allow both CallbackQueryHandler and MessageHandler
-        )
-        self.application.add_handler(conv_handler_block_user)
-
+        # -------- Conversation Handlers --------
+        # (entry callback pattern, entry handler, {state: text input handler})
+        conversations = [
+            # Generating a StringSession
+            ('generate_string_session', self.start_generate_string_session, {
+                self.GENERATE_SS_API_ID: self.generate_ss_api_id,
+                self.GENERATE_SS_API_HASH: self.generate_ss_api_hash,
+                self.GENERATE_SS_PHONE: self.generate_ss_phone,
+                self.GENERATE_SS_CODE: self.generate_ss_code,
+                self.GENERATE_SS_PASSWORD: self.generate_ss_password,
+            }),
+            # Setting the Apify API Token
+            ('set_apify_token', self.start_set_apify_token, {
+                self.SET_APIFY_TOKEN_STATE: self.set_apify_token,
+            }),
+            # Setting the Channel Username
+            ('set_channel_username', self.start_set_channel_username, {
+                self.SET_CHANNEL_USERNAME_STATE: self.set_channel_username,
+            }),
+            # Blocking a user
+            ('block_user_prompt', self.block_user_prompt, {
+                self.BLOCK_USER_ID_STATE: self.block_user_input_handler,
+            }),
+        ]
+        cancel_fallbacks = [CommandHandler("cancel", self.cancel)]
+        for pattern, entry_handler, state_handlers in conversations:
+            self.application.add_handler(ConversationHandler(
+                entry_points=[CallbackQueryHandler(entry_handler, pattern=pattern)],
+                states={
+                    state: [MessageHandler(TEXT_INPUT_FILTER, handler)]
+                    for state, handler in state_handlers.items()
+                },
+                fallbacks=cancel_fallbacks,
+                allow_reentry=True,
+                per_message=False  # Set per_message=False to allow both CallbackQueryHandler and MessageHandler
+            ))
+
+        # -------- CallbackQueryHandler for Buttons --------
+        # A single router handles every other button; it is registered after the
+        # ConversationHandlers so that their entry callbacks (generate_string_session,
+        # block_user_prompt, ...) are matched first
+        self.application.add_handler(CallbackQueryHandler(self.button_handler))
+
         # -------- Message Handlers --------
         self.application.add_handler(MessageHandler(filters.Document.ALL, self.upload_csv_handler))
 
         # Register the general text message handler (if needed)
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text_messages))
+        self.application.add_handler(MessageHandler(TEXT_INPUT_FILTER, self.handle_text_messages))
 
         # -------- Error Handler --------
         self.application.add_error_handler(self.error_handler)
 
+    async def _admin_gate(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Let only admins' updates through to the other handlers.
+
+        Args:
+            update (Update): Telegram update.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+
+        Raises:
+            ApplicationHandlerStop: If the update does not come from an admin.
+        """
+        user = update.effective_user
+        if user is not None and is_admin(user.id):
+            return
+
+        if update.callback_query:
+            await update.callback_query.answer(ACCESS_DENIED_TEXT, show_alert=True)
+        elif user is not None and update.effective_message:
+            await update.effective_message.reply_text(ACCESS_DENIED_TEXT)
+        raise ApplicationHandlerStop
+
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Handle the /start command.
@@ -599,18 +1648,24 @@ class TelegramBot:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await update.message.reply_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
+        # Show the main menu keyboard (also reached from the "back" buttons)
+        await self._send_menu(update, WELCOME_TEXT, MAIN_MENU_MARKUP)
 
-        # Show the main menu keyboard
-        keyboard = self.get_main_menu_keyboard()
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "سلام! لطفاً یکی از گزینه‌های زیر را انتخاب کنید:",
-            reply_markup=reply_markup
-        )
+    async def _send_menu(self, update: Update, text: str, reply_markup: InlineKeyboardMarkup, parse_mode: str = None):
+        """
+        Show a menu, editing the message when the update is a button press and replying otherwise.
+
+        Args:
+            update (Update): Telegram update.
+            text (str): Menu text.
+            reply_markup (InlineKeyboardMarkup): Menu keyboard.
+            parse_mode (str, optional): Parse mode of the text. Defaults to None.
+        """
+        query = update.callback_query
+        if query:
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        else:
+            await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -620,30 +1675,7 @@ class TelegramBot:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await update.message.reply_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
-
-        help_text = (
-            "📄 **دستورات و گزینه‌ها:**\n\n"
-            "/start - شروع ربات و نمایش گزینه‌ها\n"
-            "/help - نمایش پیام راهنما\n"
-            "/cancel - لغو عملیات جاری\n"
-            "/status - نمایش وضعیت فعلی ربات\n\n"
-            "**گزینه‌ها (از طریق دکمه‌ها):**\n"
-            "• ⚙️ تنظیمات\n"
-            "• 📂 آپلود مخاطبین CSV\n"
-            "• ➕ افزودن کاربران به کانال هدف\n"
-            "• 🛑 مدیریت کاربران مسدود شده\n"
-            "• 📤 صادرات داده‌ها\n"
-            "• ❌ خروج کامل\n\n"
-            "**نکات:**\n"
-            "- فایل‌های CSV باید حاوی شماره تلفن‌ها در فرمت بین‌المللی (مثلاً +1234567890) باشند.\n"
-            "- فقط کاربرانی که در لیست ادمین‌ها هستند می‌توانند از این ربات استفاده کنند.\n"
-            "- پس از آپلود CSV و پردازش، می‌توانید کاربران ثبت‌شده را به کانال هدف اضافه کنید."
-        )
-        await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+        await update.message.reply_text(HELP_TEXT, parse_mode=ParseMode.HTML)
 
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -653,21 +1685,17 @@ class TelegramBot:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await update.message.reply_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
-
+        settings = self.settings
         status_text = (
-            f"📊 **وضعیت ربات:**\n\n"
-            f"• **Apify API Token:** {'✅ تنظیم شده' if config.get('apify_api_token') else '❌ تنظیم نشده'}\n"
-            f"• **Telegram API ID:** {config.get('telegram_api_id') or '❌ تنظیم نشده'}\n"
-            f"• **Telegram API Hash:** {config.get('telegram_api_hash') or '❌ تنظیم نشده'}\n"
-            f"• **String Session:** {'✅ تنظیم شده' if config.get('telegram_string_session') else '❌ تنظیم نشده'}\n"
-            f"• **Target Channel Username:** {config.get('target_channel_username') or '❌ تنظیم نشده'}\n"
-            f"• **Blocked Users Count:** {len(config.get('blocked_users', []))}"
+            f"📊 <b>وضعیت ربات:</b>\n\n"
+            f"• <b>Apify API Token:</b> {'✅ تنظیم شده' if settings.apify_api_token else '❌ تنظیم نشده'}\n"
+            f"• <b>Telegram API ID:</b> {settings.telegram_api_id or '❌ تنظیم نشده'}\n"
+            f"• <b>Telegram API Hash:</b> {html.escape(settings.telegram_api_hash or '❌ تنظیم نشده')}\n"
+            f"• <b>String Session:</b> {'✅ تنظیم شده' if settings.telegram_string_session else '❌ تنظیم نشده'}\n"
+            f"• <b>Target Channel Username:</b> {html.escape(settings.target_channel_username or '❌ تنظیم نشده')}\n"
+            f"• <b>Blocked Users Count:</b> {len(blocked_users_set)}"
         )
-        await update.message.reply_text(status_text, parse_mode=ParseMode.MARKDOWN)
+        await update.message.reply_text(status_text, parse_mode=ParseMode.HTML)
 
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -677,125 +1705,176 @@ class TelegramBot:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await update.message.reply_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
-
-        if update.message:
-            await update.message.reply_text('📴 عملیات جاری لغو شد.')
-        elif update.callback_query:
-            await update.callback_query.edit_message_text('📴 عملیات جاری لغو شد.')
-        # Clear any user data state
+        # Clear any user data state, closing a pending String Session client
+        await self._drop_ss_client(context)
         context.user_data.clear()
-        # Show main menu again
-        keyboard = self.get_main_menu_keyboard()
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        if update.message:
-            await update.message.reply_text(
-                "لطفاً یکی از گزینه‌های زیر را انتخاب کنید:",
-                reply_markup=reply_markup
-            )
-        elif update.callback_query:
-            await update.callback_query.edit_message_text(
-                "لطفاً یکی از گزینه‌های زیر را انتخاب کنید:",
-                reply_markup=reply_markup
-            )
+        # Confirm the cancellation and show the main menu again in a single message
+        await self._send_menu(update, CANCEL_TEXT, MAIN_MENU_MARKUP)
+        # End the conversation when used as a ConversationHandler fallback
+        return ConversationHandler.END
 
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
-        Handle all callback queries from inline buttons.
+        Route all callback queries from inline buttons.
+
+        Fixed callback data is dispatched with a dict lookup; only unblock and
+        page buttons, which carry a number, fall through to a regex match.
 
         Args:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
+        # Answer once here, concurrently with the edit the routed handler makes
+        self._answer_query(query)
 
         data = query.data
 
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await query.edit_message_text("❌ شما اجازه استفاده از این ربات را ندارید.")
+        handler = self._callback_dispatch.get(data)
+        if handler is not None:
+            await handler(update, context)
             return
 
-        # Settings Button
-        if data == "settings":
-            await self.settings_menu(update, context)
+        match = self.UNBLOCK_CALLBACK_PATTERN.match(data)
+        if match:
+            await self.unblock_user(update, context, int(match.group(1)))
+            return
 
-        elif data == "upload_csv":
-            if not self.checker:
-                await query.edit_message_text("❌ لطفاً ابتدا در تنظیمات ربات Apify API Token را تنظیم کنید.")
-                return
-            await query.edit_message_text("📂 لطفاً فایل CSV حاوی شماره تلفن‌ها را ارسال کنید.")
-
-        elif data == "add_to_channel":
-            # Check if CSV has been uploaded and processed
-            session_data = get_session(user_id)
-            if not session_data.get("results"):
-                await query.edit_message_text(
-                    "❌ لطفاً ابتدا یک فایل CSV آپلود و پردازش کنید."
-                )
-                return
-            await self.add_to_channel(update, context)
+        match = self.BLOCKED_PAGE_CALLBACK_PATTERN.match(data)
+        if match:
+            await self.manage_blocked_menu(update, context, page=int(match.group(1)))
+            return
 
-        elif data == "manage_blocked":
-            await self.manage_blocked_menu(update, context)
+        await query.edit_message_text("❓ گزینه انتخابی نامعتبر است. لطفاً دوباره تلاش کنید.")
 
-        elif data == "export_data":
-            await self.export_data_menu(update, context)
+    def _answer_query(self, query: Any):
+        """
+        Answer a callback query in the background.
 
-        elif data == "exit":
-            await query.edit_message_text("❌ ربات با موفقیت متوقف شد.")
-            await self.application.stop()
-            await self.application.shutdown()
-            logger.info("Bot has been stopped gracefully.")
+        The answer only stops the button's loading spinner, so it is sent
+        alongside the handler's edit instead of before it.
 
-        elif re.match(r"^unblock_user_\d+$", data):
-            try:
-                target_user_id = int(data.split("_")[-1])
-                await self.unblock_user(update, context, target_user_id)
-            except ValueError:
-                await query.edit_message_text("❌ شناسه کاربری نامعتبر است.")
+        Args:
+            query (CallbackQuery): Callback query to answer.
+        """
+        self.application.create_task(query.answer())
 
-        elif data == "back_to_main":
-            await self.start_command(update, context)
+    async def upload_csv_prompt(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Ask the admin to send a CSV file.
 
-        # Export Data Handlers
-        elif data == "export_registered_users":
-            await self.export_registered_users(update, context)
+        Args:
+            update (Update): Telegram update.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+        """
+        query = update.callback_query
+        if not self.checker:
+            await query.edit_message_text("❌ لطفاً ابتدا در تنظیمات ربات Apify API Token را تنظیم کنید.")
+            return
+        await query.edit_message_text("📂 لطفاً فایل CSV حاوی شماره تلفن‌ها را ارسال کنید.")
 
-        elif data == "list_user_ids":
-            await self.list_user_ids(update, context)
+    async def add_to_channel_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Start adding users to the channel if a CSV has been uploaded and processed.
 
-        else:
-            await query.edit_message_text("❓ گزینه انتخابی نامعتبر است. لطفاً دوباره تلاش کنید.")
+        The invites run on the chat's job queue, so the bot keeps processing other
+        updates meanwhile; the progress message is edited when the job finishes.
 
-    async def settings_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        Args:
+            update (Update): Telegram update.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        Display the settings menu.
+        session_data = await get_session_async(update.effective_user.id)
+        if not session_data.results:
+            await update.callback_query.edit_message_text(
+                "❌ لطفاً ابتدا یک فایل CSV آپلود و پردازش کنید."
+            )
+            return
+        if self._adding_users:
+            await update.callback_query.edit_message_text(
+                "⏳ افزودن کاربران به کانال در حال انجام است. لطفاً تا پایان آن صبر کنید."
+            )
+            return
+        self._adding_users = True
+        await self._enqueue(update.effective_chat.id, self._run_add_to_channel(update, context))
+
+    async def _run_add_to_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Run add_to_channel as a queued job, allowing the next run once it is done.
 
         Args:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        query = update.callback_query
-        await query.answer()
+        try:
+            await self.add_to_channel(update, context)
+        finally:
+            self._adding_users = False
+            # Adders replaced during the run can now let go of their clients
+            self._disconnect_retired_adders()
 
-        keyboard = [
-            [InlineKeyboardButton("🔧 تولید String Session", callback_data="generate_string_session"),
-             InlineKeyboardButton("🔧 تنظیم Apify API Token", callback_data="set_apify_token")],
-            [InlineKeyboardButton("🔧 تنظیم Target Channel Username", callback_data="set_channel_username")],
-            [InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    async def _enqueue(self, chat_id: int, job: Awaitable):
+        """
+        Queue a long-running job for a chat.
 
-        await query.edit_message_text(
-            "⚙️ **تنظیمات ربات:**\n\n"
-            "لطفاً یکی از تنظیمات زیر را انتخاب کنید تا مقدار آن را وارد یا به‌روزرسانی کنید:",
-            reply_markup=reply_markup
-        )
+        Jobs of the same chat run one after another in submission order, while
+        jobs of different chats run concurrently, without holding up the
+        update that submitted them.
+
+        Args:
+            chat_id (int): Chat the job belongs to.
+            job (Awaitable): Coroutine to run.
+        """
+        job_queue = self._chat_queues.get(chat_id)
+        if job_queue is None:
+            job_queue = self._chat_queues[chat_id] = asyncio.Queue()
+            self._chat_workers[chat_id] = self.application.create_task(self._chat_worker(chat_id, job_queue))
+        await job_queue.put(job)
+
+    async def _chat_worker(self, chat_id: int, job_queue: asyncio.Queue):
+        """
+        Run the queued jobs of a chat in order, exiting when the queue is empty.
+
+        Args:
+            chat_id (int): Chat whose jobs are run.
+            job_queue (asyncio.Queue): Queue of the chat's pending jobs.
+        """
+        while True:
+            job = await job_queue.get()
+            try:
+                await job
+            except Exception:
+                logger.exception("Background job for chat %s failed.", chat_id)
+            if job_queue.empty():
+                del self._chat_queues[chat_id]
+                del self._chat_workers[chat_id]
+                return
+
+    async def exit_bot(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Stop the bot.
+
+        Args:
+            update (Update): Telegram update.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+        """
+        await update.callback_query.edit_message_text("❌ ربات با موفقیت متوقف شد.")
+        # Stopping the application from inside a handler would wait for this very update;
+        # run() stops and shuts it down once the event is set
+        logger.info("Exit requested by user %s.", update.effective_user.id)
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def settings_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Display the settings menu.
+
+        Args:
+            update (Update): Telegram update.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+        """
+        # Also shown after a setting was entered as a text message
+        await self._send_menu(update, SETTINGS_MENU_TEXT, SETTINGS_MENU_MARKUP, parse_mode=ParseMode.HTML)
 
     async def start_generate_string_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -806,11 +1885,11 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
+        self._answer_query(query)
         await query.edit_message_text(
-            "🔧 **تولید String Session**\n\n"
+            "🔧 <b>تولید String Session</b>\n\n"
             "لطفاً مراحل زیر را دنبال کنید تا String Session خود را تولید و تنظیم کنید.",
-            parse_mode=ParseMode.MARKDOWN
+            parse_mode=ParseMode.HTML
         )
         # Start by asking for API ID
         await context.bot.send_message(
@@ -828,7 +1907,7 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         text = update.message.text.strip()
-        if not text.isdigit():
+        if not API_ID_REGEX.match(text):
             await update.message.reply_text("❌ لطفاً یک عدد معتبر برای Telegram API ID وارد کنید:")
             return self.GENERATE_SS_API_ID
 
@@ -862,16 +1941,67 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         text = update.message.text.strip()
-        if not text.startswith("+") or not text[1:].isdigit():
+        if not PHONE_REGEX.match(text):
             await update.message.reply_text("❌ لطفاً یک شماره تلفن معتبر با کد کشور وارد کنید (مثلاً +1234567890):")
             return self.GENERATE_SS_PHONE
 
         phone_number = text
         context.user_data['generate_ss_phone'] = phone_number
         await update.message.reply_text("🔄 در حال ارسال کد تایید به شماره تلفن شما...")
+
+        # Connect once; the same client is reused for the code and password steps
+        await self._drop_ss_client(context)
+        telethon_client = TelegramClient(
+            StringSession(),
+            context.user_data.get('generate_ss_api_id'),
+            context.user_data.get('generate_ss_api_hash')
+        )
+        try:
+            await telethon_client.connect()
+            sent_code = await telethon_client.send_code_request(phone_number)
+        except Exception as e:
+            logger.error("Telethon connection error: %s", e)
+            await telethon_client.disconnect()
+            await update.message.reply_text("❌ خطا در اتصال به Telegram. لطفاً مجدداً تلاش کنید.")
+            return ConversationHandler.END
+
+        context.user_data['telethon_client'] = telethon_client
+        context.user_data['generate_ss_phone_code_hash'] = sent_code.phone_code_hash
         await update.message.reply_text("📩 لطفاً کدی که دریافت کردید را وارد کنید:")
         return self.GENERATE_SS_CODE
 
+    async def _drop_ss_client(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Disconnect and forget the Telethon client used to generate a String Session, if any.
+
+        Args:
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+        """
+        telethon_client = context.user_data.pop('telethon_client', None)
+        if telethon_client is not None:
+            try:
+                await telethon_client.disconnect()
+            except Exception as e:
+                logger.warning("Failed to disconnect Telethon client: %s", e)
+
+    async def _finish_string_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE, telethon_client: TelegramClient):
+        """
+        Store the generated String Session and its API credentials, then reinitialize components.
+
+        Args:
+            update (Update): Telegram update.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+            telethon_client (TelegramClient): Signed-in Telethon client.
+        """
+        config["telegram_string_session"] = telethon_client.session.save()
+        config["telegram_api_id"] = context.user_data.get('generate_ss_api_id')
+        config["telegram_api_hash"] = context.user_data.get('generate_ss_api_hash')
+        await save_config_async()
+        await self._drop_ss_client(context)
+        await update.message.reply_text("✅ <b>String Session با موفقیت تولید و تنظیم شد!</b>", parse_mode=ParseMode.HTML)
+        # Reinitialize TelegramAdder with new String Session
+        self.initialize_components()
+
     async def generate_ss_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Handle verification code input.
@@ -882,38 +2012,35 @@ class TelegramBot:
         """
         code = update.message.text.strip()
         phone_number = context.user_data.get('generate_ss_phone')
-        api_id = context.user_data.get('generate_ss_api_id')
-        api_hash = context.user_data.get('generate_ss_api_hash')
+        phone_code_hash = context.user_data.get('generate_ss_phone_code_hash')
+        telethon_client = context.user_data.get('telethon_client')
 
         if not code:
             await update.message.reply_text("❌ لطفاً کد تایید را وارد کنید:")
             return self.GENERATE_SS_CODE
 
-        # Initialize Telethon client for this session using async with
+        if telethon_client is None:
+            await update.message.reply_text("❌ خطا در اتصال به Telegram. لطفاً مجدداً تلاش کنید.")
+            return ConversationHandler.END
+
         try:
-            async with TelegramClient(StringSession(), api_id, api_hash) as telethon_client:
-                if not await telethon_client.is_user_authorized():
-                    await telethon_client.send_code_request(phone_number)
-                try:
-                    await telethon_client.sign_in(phone=phone_number, code=code)
-                except errors.SessionPasswordNeededError:
-                    await update.message.reply_text("🔐 احراز هویت دو مرحله‌ای فعال است. لطفاً رمز عبور خود را وارد کنید:")
-                    return self.GENERATE_SS_PASSWORD
-                except errors.PhoneCodeInvalidError:
-                    await update.message.reply_text("❌ کد تایید نامعتبر است. لطفاً دوباره تلاش کنید:")
-                    return self.GENERATE_SS_CODE
-
-                # If sign_in is successful
-                string_session = telethon_client.session.save()
-                config["telegram_string_session"] = string_session
-                save_config()
-                await update.message.reply_text("✅ **String Session با موفقیت تولید و تنظیم شد!**")
-                # Reinitialize TelegramAdder with new String Session
-                self.initialize_components()
-                return ConversationHandler.END
+            try:
+                await telethon_client.sign_in(phone=phone_number, code=code, phone_code_hash=phone_code_hash)
+            except errors.SessionPasswordNeededError:
+                # Keep the client connected for the password step
+                await update.message.reply_text("🔐 احراز هویت دو مرحله‌ای فعال است. لطفاً رمز عبور خود را وارد کنید:")
+                return self.GENERATE_SS_PASSWORD
+            except errors.PhoneCodeInvalidError:
+                await update.message.reply_text("❌ کد تایید نامعتبر است. لطفاً دوباره تلاش کنید:")
+                return self.GENERATE_SS_CODE
+
+            # If sign_in is successful
+            await self._finish_string_session(update, context, telethon_client)
+            return ConversationHandler.END
 
         except Exception as e:
-            logger.error(f"Telethon connection error: {e}")
+            logger.error("Telethon connection error: %s", e)
+            await self._drop_ss_client(context)
             await update.message.reply_text("❌ خطا در اتصال به Telegram. لطفاً مجدداً تلاش کنید.")
             return ConversationHandler.END
 
@@ -930,28 +2057,23 @@ class TelegramBot:
             await update.message.reply_text("❌ لطفاً رمز عبور را وارد کنید:")
             return self.GENERATE_SS_PASSWORD
 
-        phone_number = context.user_data.get('generate_ss_phone')
-        api_id = context.user_data.get('generate_ss_api_id')
-        api_hash = context.user_data.get('generate_ss_api_hash')
+        telethon_client = context.user_data.get('telethon_client')
+        if telethon_client is None:
+            await update.message.reply_text("❌ خطا در احراز هویت. لطفاً مجدداً تلاش کنید.")
+            return ConversationHandler.END
 
         try:
-            async with TelegramClient(StringSession(), api_id, api_hash) as telethon_client:
-                await telethon_client.sign_in(phone=phone_number, password=password)
-
-                # If password sign_in is successful
-                string_session = telethon_client.session.save()
-                config["telegram_string_session"] = string_session
-                save_config()
-                await update.message.reply_text("✅ **String Session با موفقیت تولید و تنظیم شد!**")
-                # Reinitialize TelegramAdder with new String Session
-                self.initialize_components()
-                return ConversationHandler.END
+            await telethon_client.sign_in(password=password)
+
+            # If password sign_in is successful
+            await self._finish_string_session(update, context, telethon_client)
+            return ConversationHandler.END
 
         except errors.PasswordHashInvalidError:
             await update.message.reply_text("❌ رمز عبور نامعتبر است. لطفاً دوباره تلاش کنید:")
             return self.GENERATE_SS_PASSWORD
         except Exception as e:
-            logger.error(f"Telethon sign_in password error: {e}")
+            logger.error("Telethon sign_in password error: %s", e)
             await update.message.reply_text("❌ خطا در احراز هویت. لطفاً مجدداً تلاش کنید.")
             return self.GENERATE_SS_PASSWORD
 
@@ -964,11 +2086,11 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
+        self._answer_query(query)
         await query.edit_message_text(
-            "🔧 **تنظیم Apify API Token**\n\n"
+            "🔧 <b>تنظیم Apify API Token</b>\n\n"
             "لطفاً Apify API Token خود را وارد کنید:",
-            parse_mode=ParseMode.MARKDOWN
+            parse_mode=ParseMode.HTML
         )
         return self.SET_APIFY_TOKEN_STATE
 
@@ -981,26 +2103,12 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         api_token = update.message.text.strip()
-        if not api_token:
-            await update.message.reply_text("❌ لطفاً یک Apify API Token معتبر وارد کنید:")
-            return self.SET_APIFY_TOKEN_STATE
-
         # Basic validation (Apify tokens are typically long alphanumeric strings)
-        if not isinstance(api_token, str) or len(api_token) < 20:
+        if len(api_token) < 20:
             await update.message.reply_text("❌ لطفاً یک Apify API Token معتبر وارد کنید:")
             return self.SET_APIFY_TOKEN_STATE
 
-        config["apify_api_token"] = api_token
-        save_config()
-
-        # Initialize or reinitialize TelegramChecker
-        self.checker = TelegramChecker(api_token)
-        logger.info("TelegramChecker re-initialized with new Apify API Token.")
-
-        await update.message.reply_text("✅ Apify API Token با موفقیت تنظیم شد.")
-        # Return to settings menu
-        await self.settings_menu(update, context)
-        return ConversationHandler.END
+        return await self._save_setting(update, context, "apify_api_token", api_token, "✅ Apify API Token با موفقیت تنظیم شد.")
 
     async def start_set_channel_username(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -1011,11 +2119,11 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
+        self._answer_query(query)
         await query.edit_message_text(
-            "🔧 **تنظیم Target Channel Username**\n\n"
+            "🔧 <b>تنظیم Target Channel Username</b>\n\n"
             "لطفاً نام کاربری کانال هدف خود را وارد کنید (با @ شروع کنید، مثلاً @yourchannelusername):",
-            parse_mode=ParseMode.MARKDOWN
+            parse_mode=ParseMode.HTML
         )
         return self.SET_CHANNEL_USERNAME_STATE
 
@@ -1028,17 +2136,32 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         text = update.message.text.strip()
-        USERNAME_REGEX = re.compile(r'^@[\w]{5,32}$')  # Telegram usernames are between 5-32 characters and can include underscores
 
         if not USERNAME_REGEX.match(text):
             await update.message.reply_text("❌ لطفاً یک نام کاربری کانال معتبر وارد کنید (با @ شروع و بین 5 تا 32 کاراکتر):")
             return self.SET_CHANNEL_USERNAME_STATE  # Reuse the same state
 
-        config["target_channel_username"] = text
-        save_config()
-        await update.message.reply_text("✅ نام کاربری کانال هدف با موفقیت تنظیم شد.")
-        # Reinitialize TelegramAdder with new channel
+        return await self._save_setting(update, context, "target_channel_username", text, "✅ نام کاربری کانال هدف با موفقیت تنظیم شد.")
+
+    async def _save_setting(self, update: Update, context: ContextTypes.DEFAULT_TYPE, key: str, value: Any, saved_text: str):
+        """
+        Store a validated setting, apply it and return to the settings menu.
+
+        Args:
+            update (Update): Telegram update with the entered value.
+            context (ContextTypes.DEFAULT_TYPE): Context for the update.
+            key (str): Configuration key of the setting.
+            value (Any): Validated value.
+            saved_text (str): Confirmation sent to the admin.
+
+        Returns:
+            int: ConversationHandler.END.
+        """
+        config[key] = value
+        await save_config_async()
+        # Rebuild the checker and adder from the new settings (and refresh the settings snapshot)
         self.initialize_components()
+        await update.message.reply_text(saved_text)
         # Return to settings menu
         await self.settings_menu(update, context)
         return ConversationHandler.END
@@ -1051,89 +2174,142 @@ class TelegramBot:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await update.message.reply_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
-
         if update.message.document:
             file = update.message.document
-            if not file.file_name.lower().endswith(".csv"):
+            # Trust the MIME type Telegram reports and only fall back to the file extension
+            if file.mime_type != "text/csv" and not (file.file_name or "").lower().endswith(".csv"):
                 await update.message.reply_text("❌ لطفاً یک فایل CSV معتبر ارسال کنید.")
                 return
 
             try:
-                # Define a temporary path to save the file
-                temp_dir = BASE_DIR / "temp"
-                temp_dir.mkdir(exist_ok=True)
-                temp_file_path = temp_dir / f"{user_id}_{file.file_name}"
-
-                # Download the file asynchronously
-                await file.get_file().download_to_drive(custom_path=str(temp_file_path))
+                # Download the upload straight into memory instead of a temporary file
+                telegram_file = await file.get_file()
+                content = await telegram_file.download_as_bytearray()
                 await update.message.reply_text("🔄 در حال پردازش فایل CSV شما. لطفاً صبر کنید...")
 
-                # Read phone numbers from CSV asynchronously
-                loop = asyncio.get_running_loop()
                 if not self.checker:
                     await update.message.reply_text("❌ Apify API Token تنظیم نشده است. لطفاً در تنظیمات آن را تنظیم کنید.")
                     return
 
-                phone_numbers = await loop.run_in_executor(self.executor, self.checker.read_csv, str(temp_file_path))
+                MAX_PHONE_NUMBERS = 1000  # Adjust as needed
+                # Parse in the bot's executor in a single call, reading at most one number past the limit
+                loop = asyncio.get_running_loop()
+                try:
+                    phone_numbers = await loop.run_in_executor(
+                        self.executor,
+                        lambda: list(islice(self.checker.iter_phone_numbers(content), MAX_PHONE_NUMBERS + 1))
+                    )
+                except (UnicodeDecodeError, csv.Error):
+                    # Already logged by iter_phone_numbers; never process a partly read file
+                    await update.message.reply_text("❌ فایل CSV خالی یا نامعتبر است.")
+                    return
                 if not phone_numbers:
                     await update.message.reply_text("❌ فایل CSV خالی یا نامعتبر است.")
                     return
 
-                MAX_PHONE_NUMBERS = 1000  # Adjust as needed
                 if len(phone_numbers) > MAX_PHONE_NUMBERS:
                     await update.message.reply_text(f"❌ تعداد شماره تلفن‌ها بیش از حد مجاز ({MAX_PHONE_NUMBERS}) است.")
                     return
 
-                # Check Telegram status using Apify
-                results = await self.checker.check_telegram_status(phone_numbers)
-
-                # Save results in session
-                session = get_session(user_id)
-                session["results"] = results
-                set_session(user_id, session)
-
-                # Save results to CSV asynchronously
-                result_file = BASE_DIR / f"telegram_results_{user_id}.csv"
-                await loop.run_in_executor(self.executor, self.checker.save_results, results, str(result_file))
-
-                # Prepare a summary
-                total = len(results)
-                registered = len([r for r in results if r.get("isRegistered")])
-                not_registered = total - registered
-                summary = (
-                    f"✅ **پردازش کامل شد!**\n\n"
-                    f"کل شماره‌ها: {total}\n"
-                    f"ثبت‌شده در تلگرام: {registered}\n"
-                    f"ثبت‌نشده: {not_registered}"
-                )
-
-                # Send summary and the results file
-                await update.message.reply_text(summary, parse_mode=ParseMode.MARKDOWN)
-                await update.message.reply_document(
-                    document=InputFile(str(result_file)),
-                    filename=result_file.name,
-                    caption="📁 این نتایج بررسی شماره تلفن‌های شما است."
-                )
-
-                # Clean up temporary files asynchronously
-                try:
-                    await loop.run_in_executor(self.executor, temp_file_path.unlink)
-                    await loop.run_in_executor(self.executor, result_file.unlink)
-                    if not any(temp_dir.iterdir()):
-                        await loop.run_in_executor(self.executor, temp_dir.rmdir)
-                except Exception as e:
-                    logger.warning(f"Failed to clean up temporary files: {e}")
+                # The check itself can take minutes; run it on the chat's job queue
+                await self._enqueue(update.effective_chat.id, self._process_csv(update, phone_numbers))
 
             except Exception as e:
-                logger.error(f"Error processing CSV: {e}")
+                logger.error("Error processing CSV: %s", e)
                 await update.message.reply_text("❌ هنگام پردازش فایل CSV خطایی رخ داد.")
         else:
             await update.message.reply_text("❌ لطفاً یک فایل CSV ارسال کنید.")
 
+    def _throttle_progress(self, report: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """
+        Wrap a progress reporting coroutine function so it runs at most once per PROGRESS_INTERVAL.
+
+        Failed progress updates are logged and otherwise ignored, so they never
+        abort the job that reports them.
+
+        Args:
+            report (callable): Coroutine function sending the progress update.
+
+        Returns:
+            callable: Throttled coroutine function taking the same arguments.
+        """
+        last_report = time.monotonic()
+
+        async def throttled(*args):
+            nonlocal last_report
+            now = time.monotonic()
+            if now - last_report < self.PROGRESS_INTERVAL:
+                return
+            last_report = now
+            try:
+                await report(*args)
+            except Exception as e:
+                logger.warning("Failed to report progress: %s", e)
+
+        return throttled
+
+    async def _process_csv(self, update: Update, phone_numbers: List[str]):
+        """
+        Check uploaded phone numbers and send the summary and results CSV.
+
+        Args:
+            update (Update): Telegram update with the uploaded document.
+            phone_numbers (list): Phone numbers read from the upload.
+        """
+        user_id = update.effective_user.id
+        total_numbers = len(phone_numbers)
+        progress_message = None
+
+        @self._throttle_progress
+        async def report_progress(checked: int):
+            # Keep editing a single progress message
+            nonlocal progress_message
+            if checked >= total_numbers:
+                return
+            progress_text = f"🔄 {checked} از {total_numbers} شماره بررسی شد..."
+            if progress_message is None:
+                progress_message = await update.message.reply_text(progress_text)
+            else:
+                await progress_message.edit_text(progress_text)
+
+        try:
+            # Check Telegram status using Apify, writing each batch to an in-memory results CSV as it finishes
+            # Rows are encoded straight into the byte buffer that is uploaded, without a str copy
+            result_buffer = io.BytesIO()
+            result_stream = io.TextIOWrapper(result_buffer, encoding="utf-8", newline="")
+            results = await self.checker.check_and_write(phone_numbers, result_stream, progress=report_progress)
+            result_stream.flush()
+            result_stream.detach()
+            result_buffer.seek(0)
+
+            # Save results in session, together with the views derived from them
+            session = Session.from_results(results)
+            await set_session_async(user_id, session)
+
+            # Prepare a summary
+            total = len(results)
+            registered = session.registered_count
+            not_registered = total - registered
+            summary = (
+                f"✅ <b>پردازش کامل شد!</b>\n\n"
+                f"کل شماره‌ها: {total}\n"
+                f"ثبت‌شده در تلگرام: {registered}\n"
+                f"ثبت‌نشده: {not_registered}"
+            )
+
+            # Send the results file with the summary as its caption (well below the 1024 character limit)
+            result_filename = f"telegram_results_{user_id}.csv"
+            await update.message.reply_document(
+                document=InputFile(result_buffer, filename=result_filename),
+                filename=result_filename,
+                caption=summary + "\n\n📁 این نتایج بررسی شماره تلفن‌های شما است.",
+                parse_mode=ParseMode.HTML
+            )
+
+        except Exception as e:
+            logger.error("Error processing CSV: %s", e)
+            await update.message.reply_text("❌ هنگام پردازش فایل CSV خطایی رخ داد.")
+
     async def add_to_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Add verified users to the target channel.
@@ -1146,116 +2322,183 @@ class TelegramBot:
         await query.edit_message_text("🔄 در حال افزودن کاربران به کانال هدف. لطفاً صبر کنید...")
 
         user_id = update.effective_user.id
-        session_data = get_session(user_id)
-        results = session_data.get("results", [])
+        session_data = await get_session_async(user_id)
+        results = session_data.results
 
         if not results:
             await query.edit_message_text("❌ هیچ داده‌ای برای افزودن وجود ندارد.")
             return
 
-        # Filter registered users with valid user IDs
-        registered_users = [r for r in results if r.get("isRegistered") and r.get("userId")]
-        if not registered_users:
+        # User IDs of the registered users
+        registered_ids = session_data.registered_ids
+        if not registered_ids:
             await query.edit_message_text("❌ هیچ شماره تلفنی ثبت‌شده در تلگرام یافت نشد.")
             return
 
-        # Get blocked users
-        blocked_users = config.get("blocked_users", [])
-
-        # Extract user IDs
-        user_ids = [r.get("userId") for r in registered_users if r.get("userId")]
+        # Extract unique user IDs in their original order, leaving out blocked users
+        user_ids = [
+            uid for uid in dict.fromkeys(registered_ids)
+            if uid not in blocked_users_set
+        ]
+        if len(user_ids) < len(registered_ids):
+            logger.info("Skipping %d duplicate or blocked users.", len(registered_ids) - len(user_ids))
+        if not user_ids:
+            await query.edit_message_text("❌ همه کاربران ثبت‌شده در لیست مسدود شده‌ها هستند.")
+            return
 
-        # Initialize TelegramAdder client
-        if not self.adder:
+        # Initialize TelegramAdder client; the run keeps using this adder even if a settings change replaces it
+        adder = self.adder
+        if not adder:
             await query.edit_message_text("❌ ربات به درستی تنظیم نشده است. لطفاً با مدیر تماس بگیرید.")
             return
 
+        cooldown = adder.cooldown_remaining()
+        if cooldown:
+            await query.edit_message_text(f"⏳ به دلیل محدودیت سرعت تلگرام، لطفاً {cooldown} ثانیه دیگر دوباره تلاش کنید.")
+            return
+
         try:
-            await self.adder.connect()
+            await adder.connect()
         except errors.RPCError as e:
-            logger.error(f"Telethon connection error: {e}")
+            logger.error("Telethon connection error: %s", e)
             await query.edit_message_text("❌ خطا در اتصال به Telegram. لطفاً بررسی کنید.")
             return
         except Exception as e:
-            logger.error(f"Unexpected error during Telethon connection: {e}")
+            logger.error("Unexpected error during Telethon connection: %s", e)
             await query.edit_message_text("❌ خطای غیرمنتظره رخ داد. لطفاً دوباره تلاش کنید.")
             return
 
+        @self._throttle_progress
+        async def report_progress(processed: int, total: int):
+            if processed < total:
+                await query.edit_message_text(f"🔄 {processed} از {total} کاربر پردازش شد...")
+
         # Add users to channel
         try:
-            summary = await self.adder.add_users_to_channel(user_ids, blocked_users)
-        except errors.FloodWaitError as e:
-            logger.warning(f"Flood wait error: {e}. Sleeping for {e.seconds} seconds.")
-            await asyncio.sleep(e.seconds)
-            await query.edit_message_text("❌ ربات در حال حاضر با محدودیت سرعت مواجه شده است. لطفاً بعداً دوباره تلاش کنید.")
-            return
+            summary = await adder.add_users_to_channel(user_ids, progress=report_progress)
         except PermissionError as e:
-            logger.error(f"Permission error: {e}")
+            logger.error("Permission error: %s", e)
             await query.edit_message_text(f"❌ {e}")
             return
         except Exception as e:
-            logger.error(f"Error adding users to channel: {e}")
+            logger.error("Error adding users to channel: %s", e)
             await query.edit_message_text(f"❌ خطایی رخ داد: {e}")
             return
         finally:
-            await self.adder.disconnect()
+            # The client stays connected for the next run; it is disconnected on shutdown or once retired
+            # Remember the invite rate learned from flood waits for the next run
+            if adder.invite_rate != self.settings.invite_rate:
+                config["invite_rate"] = adder.invite_rate
+                self.settings = replace(self.settings, invite_rate=adder.invite_rate)
+                await save_config_async()
 
         # Prepare a summary message
         success_count = len(summary["added"])
         failure_count = len(summary["failed"])
         summary_message = (
-            f"✅ **افزودن کاربران به کانال کامل شد!**\n\n"
+            f"✅ <b>افزودن کاربران به کانال کامل شد!</b>\n\n"
             f"تعداد موفق: {success_count}\n"
             f"تعداد ناموفق: {failure_count}"
         )
-        await query.edit_message_text(summary_message, parse_mode=ParseMode.MARKDOWN)
+        # A long flood wait during the run suspends invites; failed users can be retried once it is over
+        cooldown = adder.cooldown_remaining()
+        if cooldown:
+            summary_message += f"\n\n⏳ به دلیل محدودیت سرعت تلگرام، لطفاً {cooldown} ثانیه دیگر دوباره تلاش کنید."
+        await query.edit_message_text(summary_message, parse_mode=ParseMode.HTML)
 
         if summary["added"]:
-            added_list = ", ".join(map(str, summary["added"]))
-            await query.message.reply_text(f"🟢 **کاربران اضافه شده:**\n{added_list}")
+            await self._reply_user_id_list(
+                query.message, "🟢 <b>کاربران اضافه شده:</b>", summary["added"], f"added_users_{user_id}.txt"
+            )
 
         if summary["failed"]:
-            failed_list = ", ".join(map(str, summary["failed"]))
-            await query.message.reply_text(f"🔴 **کاربران اضافه نشده:**\n{failed_list}")
+            await self._reply_user_id_list(
+                query.message, "🔴 <b>کاربران اضافه نشده:</b>", summary["failed"], f"failed_users_{user_id}.txt"
+            )
+
+    async def _reply_user_id_list(self, message: Any, title: str, user_ids: List[int], filename: str):
+        """
+        Reply with a list of user IDs, inline if it is short and as a text file otherwise.
+
+        Args:
+            message (Message): Message to reply to.
+            title (str): Heading of the list.
+            user_ids (list): Telegram user IDs to list.
+            filename (str): Name of the text file used for long lists.
+        """
+        if len(user_ids) <= self.INLINE_USER_ID_LIMIT:
+            await message.reply_text(f"{title}\n{', '.join(map(str, user_ids))}", parse_mode=ParseMode.HTML)
+            return
+        # One ID per line, encoded straight into the uploaded buffer
+        document = io.BytesIO("\n".join(map(str, user_ids)).encode("utf-8"))
+        await message.reply_document(
+            document=InputFile(document, filename=filename),
+            filename=filename,
+            caption=f"{title} {len(user_ids)}",
+            parse_mode=ParseMode.HTML
+        )
 
-    async def manage_blocked_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def manage_blocked_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
         """
-        Display the manage blocked users menu.
+        Display one page of the manage blocked users menu.
 
         Args:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
+            page (int, optional): 0-based page number. Defaults to 0.
         """
         query = update.callback_query
-        await query.answer()
 
-        user_id = update.effective_user.id
+        blocked_users = sorted(blocked_users_set)
+        page_count = max(1, -(-len(blocked_users) // self.BLOCKED_PAGE_SIZE))
+        page = min(page, page_count - 1)
+        start = page * self.BLOCKED_PAGE_SIZE
+        page_users = tuple(blocked_users[start:start + self.BLOCKED_PAGE_SIZE])
 
-        blocked_users = config.get("blocked_users", [])
-        if not blocked_users:
-            blocked_text = "🛑 **لیست کاربران مسدود شده خالی است.**"
+        if not page_users:
+            blocked_text = "🛑 <b>لیست کاربران مسدود شده خالی است.</b>"
         else:
             blocked_text = (
-                "🛑 **لیست کاربران مسدود شده:**\n\n"
-                + "\n".join([f"• {uid}" for uid in blocked_users])
+                f"🛑 <b>لیست کاربران مسدود شده ({len(blocked_users)} کاربر، صفحه {page + 1} از {page_count}):</b>\n\n"
+                + "\n".join([f"• {uid}" for uid in page_users])
             )
 
-        keyboard = [
-            [InlineKeyboardButton("➕ مسدود کردن کاربر جدید", callback_data="block_user_prompt")]
-        ]
-        # Dynamically add unblock buttons
-        for uid in blocked_users:
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"🔓 بازگشایی مسدودیت کاربر {uid}",
-                    callback_data=f"unblock_user_{uid}"
-                )
-            ])
+        reply_markup = self._blocked_menu_markup(page_users, page, page_count)
+        if query:
+            await query.edit_message_text(blocked_text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+        else:
+            await update.message.reply_text(blocked_text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _blocked_menu_markup(page_users: Tuple[int, ...], page: int, page_count: int) -> InlineKeyboardMarkup:
+        """
+        Build the keyboard of one page of the manage blocked users menu.
 
-        keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        Markups are cached, so reopening an unchanged page reuses the same object.
 
-        await query.edit_message_text(blocked_text, reply_markup=reply_markup)
+        Args:
+            page_users (tuple): Blocked user IDs shown on this page.
+            page (int): 0-based page number.
+            page_count (int): Total number of pages.
+
+        Returns:
+            InlineKeyboardMarkup: Keyboard with unblock buttons and page navigation.
+        """
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton("◀️ قبلی", callback_data=f"blocked_page_{page - 1}"))
+        if page < page_count - 1:
+            navigation.append(InlineKeyboardButton("بعدی ▶️", callback_data=f"blocked_page_{page + 1}"))
+
+        return InlineKeyboardMarkup([
+            BLOCK_USER_ROW,
+            # Unblock buttons for the users on this page
+            *([InlineKeyboardButton(f"🔓 بازگشایی مسدودیت کاربر {uid}", callback_data=f"unblock_user_{uid}")]
+              for uid in page_users),
+            *([navigation] if navigation else []),
+            BACK_TO_MAIN_ROW,
+        ])
 
     async def block_user_prompt(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -1266,7 +2509,7 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
+        self._answer_query(query)
         await query.edit_message_text(
             "➕ لطفاً شناسه کاربری تلگرام کاربری که می‌خواهید مسدود کنید را وارد کنید (عدد):"
         )
@@ -1290,13 +2533,13 @@ class TelegramBot:
 
         target_user_id = int(target_user_id_text)
 
-        if target_user_id in config.get("blocked_users", []):
+        if target_user_id in blocked_users_set:
             await update.message.reply_text(
                 f"🔍 کاربر با شناسه {target_user_id} قبلاً مسدود شده است."
             )
         else:
-            config.setdefault("blocked_users", []).append(target_user_id)
-            save_config()
+            blocked_users_set.add(target_user_id)
+            await save_config_async()
             await update.message.reply_text(
                 f"✅ کاربر با شناسه {target_user_id} با موفقیت مسدود شد."
             )
@@ -1315,12 +2558,9 @@ class TelegramBot:
             target_user_id (int): Telegram user ID to unblock.
         """
         user_id = update.effective_user.id
-        blocked_users = config.get("blocked_users", [])
-
-        if target_user_id in blocked_users:
-            blocked_users.remove(target_user_id)
-            config["blocked_users"] = blocked_users
-            save_config()
+        if target_user_id in blocked_users_set:
+            blocked_users_set.discard(target_user_id)
+            await save_config_async()
             await update.callback_query.edit_message_text(
                 f"✅ کاربر با شناسه {target_user_id} از لیست مسدود شده‌ها حذف شد."
             )
@@ -1340,23 +2580,10 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
-
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await query.edit_message_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
-
-        keyboard = [
-            [InlineKeyboardButton("📥 صادرات لیست کاربران ثبت‌شده", callback_data="export_registered_users")],
-            [InlineKeyboardButton("🔢 لیست شناسه‌های کاربران ثبت‌شده", callback_data="list_user_ids")],
-            [InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
 
         await query.edit_message_text(
             "📤 لطفاً گزینه مورد نظر برای صادرات داده‌ها را انتخاب کنید:",
-            reply_markup=reply_markup
+            reply_markup=EXPORT_MENU_MARKUP
         )
 
     async def export_registered_users(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1368,52 +2595,36 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
 
         user_id = update.effective_user.id
-        session_data = get_session(user_id)
-        results = session_data.get("results", [])
+        session_data = await get_session_async(user_id)
+        results = session_data.results
         if not results:
             await query.edit_message_text("❌ هیچ داده‌ای برای صادرات وجود ندارد.")
             return
 
-        registered_users = [r for r in results if r.get("isRegistered") and r.get("userId")]
+        registered_users = session_data.registered
         if not registered_users:
             await query.edit_message_text("❌ هیچ کاربر ثبت‌شده‌ای یافت نشد.")
             return
 
-        # Save to JSON asynchronously
-        output_file = BASE_DIR / f"registered_users_{user_id}.json"
+        # Encode the export in memory; nothing is written to disk
+        output_filename = f"registered_users_{user_id}.json"
         try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(
-                self.executor,
-                lambda: json.dump(
-                    registered_users,
-                    output_file.open("w", encoding="utf-8"),
-                    indent=4,
-                    ensure_ascii=False
-                )
-            )
-            logger.info(f"Registered users exported to {output_file}.")
+            output_buffer = io.BytesIO(dump_json(registered_users))
+            logger.info("Exported %d registered users for user %s.", len(registered_users), user_id)
         except Exception as e:
-            logger.error(f"Failed to export registered users: {e}")
+            logger.error("Failed to export registered users: %s", e)
             await query.edit_message_text("❌ خطایی در هنگام صادرات داده‌ها رخ داد.")
             return
 
-        await query.edit_message_text("📤 در حال ارسال فایل صادرات...")
+        # The export menu stays open; the document itself is the reply
         await query.message.reply_document(
-            document=InputFile(str(output_file)),
-            filename=output_file.name,
+            document=InputFile(output_buffer, filename=output_filename),
+            filename=output_filename,
             caption="📁 لیست کاربران ثبت‌شده"
         )
 
-        # Clean up the exported file asynchronously
-        try:
-            await loop.run_in_executor(self.executor, output_file.unlink)
-        except Exception as e:
-            logger.warning(f"Failed to delete exported file {output_file}: {e}")
-
     async def list_user_ids(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         List all user IDs processed.
@@ -1423,22 +2634,22 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         query = update.callback_query
-        await query.answer()
 
         user_id = update.effective_user.id
-        session_data = get_session(user_id)
-        results = session_data.get("results", [])
+        session_data = await get_session_async(user_id)
+        results = session_data.results
         if not results:
             await query.edit_message_text("❌ هیچ داده‌ای برای نمایش وجود ندارد.")
             return
 
-        user_ids = [str(r.get("userId")) for r in results if r.get("isRegistered") and r.get("userId")]
+        title = "🔢 <b>لیست شناسه‌های کاربران ثبت‌شده:</b>"
+        user_ids = session_data.registered_ids
         if not user_ids:
-            user_ids_str = "هیچ کاربری ثبت نشده است."
-        else:
-            user_ids_str = ", ".join(user_ids)
+            await query.edit_message_text(f"{title}\nهیچ کاربری ثبت نشده است.", parse_mode=ParseMode.HTML)
+            return
 
-        await query.edit_message_text(f"🔢 **لیست شناسه‌های کاربران ثبت‌شده:**\n{user_ids_str}")
+        # The export menu stays open; long lists are sent as a text file to stay within Telegram's message limit
+        await self._reply_user_id_list(query.message, title, user_ids, f"user_ids_{user_id}.txt")
 
     async def handle_text_messages(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -1448,11 +2659,6 @@ class TelegramBot:
             update (Update): Telegram update.
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
-        user_id = update.effective_user.id
-        if not is_admin(user_id):
-            await update.message.reply_text("❌ شما اجازه استفاده از این ربات را ندارید.")
-            return
-
         # Other text messages can be handled as needed
         await update.message.reply_text(
             "❓ لطفاً از دکمه‌های ارائه شده استفاده کنید یا یک دستور معتبر ارسال کنید."
@@ -1467,69 +2673,77 @@ class TelegramBot:
             context (ContextTypes.DEFAULT_TYPE): Context for the update.
         """
         logger.error(msg="Exception while handling an update:", exc_info=context.error)
-        if isinstance(update, Update) and update.effective_user:
+        if isinstance(context.error, TRANSIENT_ERRORS):
+            return
+        message = update.effective_message if isinstance(update, Update) else None
+        if message:
             try:
-                await update.effective_message.reply_text(
-                    "❌ متاسفانه یک خطا رخ داد. لطفاً دوباره تلاش کنید."
-                )
+                await message.reply_text(ERROR_REPLY_TEXT)
             except Exception as e:
-                logger.error(f"Failed to send error message: {e}")
-
-    def get_main_menu_keyboard(self) -> List[List[InlineKeyboardButton]]:
-        """
-        Return the main menu keyboard.
-
-        Returns:
-            list: List of lists containing InlineKeyboardButtons.
-        """
-        keyboard = [
-            [InlineKeyboardButton("⚙️ تنظیمات", callback_data="settings")],
-            [
-                InlineKeyboardButton("📂 آپلود مخاطبین CSV", callback_data="upload_csv"),
-                InlineKeyboardButton("➕ افزودن کاربران به کانال هدف", callback_data="add_to_channel")
-            ],
-            [InlineKeyboardButton("🛑 مدیریت کاربران مسدود شده", callback_data="manage_blocked")],
-            [
-                InlineKeyboardButton("📤 صادرات داده‌ها", callback_data="export_data"),
-                InlineKeyboardButton("❌ خروج کامل", callback_data="exit")
-            ],
-        ]
-        return keyboard
+                logger.error("Failed to send error message: %s", e)
 
     async def run(self):
         """
         Start the bot using polling or webhook based on configuration.
         """
+        self._stop_event = asyncio.Event()
         try:
+            # Start tasks eagerly (Python 3.12+): tasks that finish without suspending, such as
+            # callback answers served from the connection pool, never go through the scheduler
+            if hasattr(asyncio, "eager_task_factory"):
+                asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
             # Initialize the application
             await self.application.initialize()
 
             # Start the application
             await self.application.start()
 
+            # Application.run_webhook()/run_polling() manage their own event loop and cannot be
+            # awaited inside one, so the updater is started directly; only one of the two runs
             if USE_WEBHOOK:
-                # Run the webhook on port 8443
-                await self.application.run_webhook(
+                # Serve the webhook on port 8443; start_webhook() also registers it with Telegram
+                await self.application.updater.start_webhook(
                     listen=self.host,
                     port=self.port,
                     url_path=self.bot_token,
-                    webhook_url=self.webhook_url
+                    webhook_url=self.webhook_url,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                    secret_token=WEBHOOK_SECRET_TOKEN,
+                    bootstrap_retries=self.BOOTSTRAP_RETRIES
                 )
-                logger.info(f"Bot is running with webhook on port {self.port} and listening for updates.")
+                logger.info("Bot is running with webhook on port %s and listening for updates.", self.port)
             else:
-                # Run polling
-                await self.application.run_polling()
+                # Long-poll only when no webhook is configured
+                await self.application.updater.start_polling(bootstrap_retries=self.BOOTSTRAP_RETRIES)
                 logger.info("Bot is running with polling and listening for updates.")
+
+            # Serve updates until SIGINT/SIGTERM (systemd stop), the exit button, or until the task is cancelled
+            loop = asyncio.get_running_loop()
+            for stop_signal in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(stop_signal, self._stop_event.set)
+                except NotImplementedError:
+                    # Not supported on Windows; Ctrl+C still cancels the task there
+                    pass
+            await self._stop_event.wait()
+            logger.info("Stop requested. Shutting down.")
         except Exception as e:
-            logger.error(f"Failed to start the bot: {e}")
+            logger.error("Failed to start the bot: %s", e)
         finally:
             # Ensure that Application.stop() and shutdown() are awaited
             try:
+                if self.application.updater.running:
+                    await self.application.updater.stop()
                 await self.application.stop()
                 await self.application.shutdown()
+                if self.adder:
+                    await self.adder.disconnect()
+                for adder in self._retired_adders:
+                    await adder.disconnect()
                 logger.info("Bot stopped.")
             except Exception as e:
-                logger.error(f"Error while stopping the bot: {e}")
+                logger.error("Error while stopping the bot: %s", e)
 
     # ========================
     # Core Functionalities
@@ -1559,7 +2773,19 @@ def main():
     """
     # Initialize and run the bot
     bot = TelegramBot(BOT_TOKEN, webhook_url=WEBHOOK_URL, port=8443)
-    asyncio.run(bot.run())
+
+    # Use the libuv-based event loop when it is installed
+    if uvloop is None:
+        asyncio.run(bot.run())
+        return
+    logger.info("Using uvloop event loop.")
+    if hasattr(asyncio, "Runner"):
+        # Python 3.11+: hand the loop factory to the runner instead of replacing the global policy
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(bot.run())
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(bot.run())
 
 if __name__ == "__main__":
     try:
@@ -1567,4 +2793,4 @@ if __name__ == "__main__":
     except (KeyboardInterrupt, SystemExit):
         logger.info("Bot stopped by user.")
     except Exception as e:
-        logger.exception(f"Unhandled exception: {e}")
+        logger.exception("Unhandled exception: %s", e)